@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+
+# Checks that data rows loaded via the plain row fast path are identical
+# to the same rows loaded via the full parser (forced by writing the first
+# character of each row as a single character class, e.g. "[h]ost1"), for
+# both CSV and TSV, then reports rows/second for each path.
+#
+# python3 benchmarks/data_loader.py [rows]
+
+import os, sys, time, random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from jinjafx import JinjaFx
+
+def generate(rows, delim):
+  rnd = random.Random(rows)
+  q = lambda s: rnd.choice([s, f'"{s}"', f"'{s}'"]) if ' ' not in s or delim == '\t' else f'"{s}"'
+  plain = [delim.join(['HOST', 'ID:int', 'WEIGHT:float', '[TAGS]', 'DESC', 'SITE'])]
+
+  for i in range(rows):
+    fields = [
+      f'host{i}.{rnd.choice(["lon", "nyc", "sgp"])}',
+      str(rnd.randrange(100000)),
+      str(rnd.random() * 100),
+      ';'.join(rnd.sample(['core', 'edge', 'mgmt', 'lab', 'prod'], rnd.randrange(1, 4))),
+      q(rnd.choice(['', 'uplink', 'core router', 'spare port-7', 'x=1 y=2'])),
+      q(rnd.choice(['site-a', 'site b', '']))
+    ]
+
+    if rnd.random() < 0.05:
+      fields = fields[:rnd.randrange(4, 6)]
+
+    elif rnd.random() < 0.05:
+      fields.append('extra')
+
+    line = delim.join(f' {f} ' if delim == ',' and rnd.random() < 0.1 else f for f in fields)
+
+    if rnd.random() < 0.01:
+      plain.append(rnd.choice(['', '# comment', '  # indented comment']))
+
+    plain.append(line)
+
+  full = [plain[0]] + [f'[{l[0]}]{l[1:]}' if l.startswith('host') else l for l in plain[1:]]
+  return '\n'.join(plain) + '\n', '\n'.join(full) + '\n'
+
+def load(engine, data, gvars=None):
+  template = '{% for r in range(1, jinjafx.rows + 1) %}{{ jinjafx.data(r) }}\n{% endfor %}'
+
+  t = time.perf_counter()
+  outputs = engine.render(template, data, { 'jinjafx_disable_dataloop': True, **(gvars or {}) })['_stdout_']
+  return outputs, time.perf_counter() - t
+
+def main():
+  rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+
+  with JinjaFx.Engine() as engine:
+    for name, delim in (('CSV', ','), ('TSV', '\t')):
+      plain, full = generate(rows, delim)
+      fast, tfast = load(engine, plain)
+      slow, tslow = load(engine, full)
+
+      assert len(fast) == rows, f'{name}: expected {rows} rows, got {len(fast)}'
+      assert fast == slow, f'{name}: fast path rows differ from the full parser'
+
+      gvars = { 'jinjafx_filter': { 'TAGS': '^core$', 'SITE': 'site' } }
+      assert load(engine, plain, gvars)[0] == load(engine, full, gvars)[0], f'{name}: filtered rows differ'
+
+      print(f'{name}: {rows} rows, full parser {rows / tslow:,.0f} rows/s, fast path {rows / tfast:,.0f} rows/s')
+
+if __name__ == '__main__':
+  main()
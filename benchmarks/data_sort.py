@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+
+# Checks that jinjafx_sort gives the same row order as the original
+# implementation (reproduced below, which re-sorts once per field in
+# reverse order) on three fields including a regex ranked one, then
+# times both.
+#
+# python3 benchmarks/data_sort.py [rows]
+
+import os, sys, time, re, random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from jinjafx import JinjaFx
+
+def find_re_match(o, v, default=0):
+  for rx in o:
+    if rx[0].match(v):
+      return rx[1]
+  return default
+
+def reference(header, rows, jinjafx_sort):
+  for field in reversed(jinjafx_sort):
+    if isinstance(field, dict):
+      fn = next(iter(field))
+      mv = [[re.compile(rx + '$'), v] for rx, v in field[fn].items()]
+      rows = sorted(rows, key=lambda n: (find_re_match(mv, n[header.index(fn.lstrip('+-'))]), n[header.index(fn.lstrip('+-'))]), reverse=fn.startswith('-'))
+
+    else:
+      rows = sorted(rows, key=lambda n: n[header.index(field.lstrip('+-'))], reverse=field.startswith('-'))
+
+  return rows
+
+def render(engine, data, gvars):
+  template = '{% for r in range(1, jinjafx.rows + 1) %}{{ jinjafx.data(r) }}\n{% endfor %}'
+
+  t = time.perf_counter()
+  outputs = engine.render(template, data, { 'jinjafx_disable_dataloop': True, **gvars })['_stdout_']
+  return outputs, time.perf_counter() - t
+
+def main():
+  nrows = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+  rnd = random.Random(nrows)
+
+  header = ['SITE', 'ROLE', 'ID', 'SEQ']
+  sites = ['lon', 'nyc', 'sgp', 'fra', 'syd', 'lab1', 'lab2']
+  roles = ['core', 'edge', 'access', 'mgmt']
+  rows = [[rnd.choice(sites), rnd.choice(roles), rnd.randrange(200), i] for i in range(nrows)]
+  data = 'SITE,ROLE,ID:int,SEQ:int\n' + ''.join(','.join(map(str, r)) + '\n' for r in rows)
+
+  with JinjaFx.Engine() as engine:
+    unsorted, tload = render(engine, data, {})
+    assert len(unsorted) == nrows
+
+    for jinjafx_sort in ([{ 'SITE': { 'lab.*': 2, 'lon|fra': -1 } }, '-ROLE', 'ID'], [{ '-SITE': { 'lab.*': 2, 'lon|fra': -1 } }, 'ROLE', '-ID']):
+      t = time.perf_counter()
+      expected = [str(r) for r in reference(header, rows, jinjafx_sort)]
+      tref = time.perf_counter() - t
+
+      outputs, tsort = render(engine, data, { 'jinjafx_sort': jinjafx_sort })
+      assert outputs == expected, f'jinjafx_sort {jinjafx_sort} order differs from the original implementation'
+
+      print(f'{nrows} rows on {jinjafx_sort}: original sort {tref:.2f}s, render with jinjafx_sort {tsort:.2f}s (without {tload:.2f}s)')
+
+if __name__ == '__main__':
+  main()
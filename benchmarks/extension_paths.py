@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+
+# Checks that rendering doesn't grow sys.path or sys.meta_path, and that
+# the cost of importlib.util.find_spec() stays flat after many renders
+# (using a single engine, plus 1000 calls to JinjaFx()._jinjafx() which
+# create their own engine).
+#
+# python3 benchmarks/extension_paths.py [renders]
+
+import os, sys, time, importlib.util
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from jinjafx import JinjaFx
+
+def find_spec_cost(n=2000):
+  t = time.perf_counter()
+  for i in range(n):
+    importlib.util.find_spec('jinjafx_missing_module')
+  return (time.perf_counter() - t) / n * 1e6
+
+def main():
+  renders = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+  extsdir = os.path.dirname(os.path.abspath(__file__))
+
+  JinjaFx()._jinjafx('{{ 1 }}', None, {}, '_stdout_', exts_dirs=[extsdir])
+  path, meta_path = list(sys.path), list(sys.meta_path)
+  before = find_spec_cost()
+
+  t = time.perf_counter()
+  with JinjaFx.Engine([extsdir]) as engine:
+    for i in range(renders):
+      engine.render('{{ x }}', None, { 'x': i })
+
+  for i in range(1000):
+    JinjaFx()._jinjafx('{{ x }}', None, { 'x': i }, '_stdout_', exts_dirs=[extsdir])
+
+  elapsed = time.perf_counter() - t
+  after = find_spec_cost()
+
+  assert sys.path == path, 'sys.path changed'
+  assert sys.meta_path == meta_path, 'sys.meta_path changed'
+
+  print(f'{renders + 1000} renders in {elapsed:.2f}s, len(sys.path) = {len(sys.path)}, len(sys.meta_path) = {len(sys.meta_path)}')
+  print(f'find_spec(): {before:.1f}us before, {after:.1f}us after')
+
+if __name__ == '__main__':
+  main()
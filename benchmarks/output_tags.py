@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+
+# Checks the single pass <output> tag parser against the original per line
+# parser (reproduced below) on a generated 100k line output, which includes
+# inline and nested tags, indexes, quoted names, formats and blank markers,
+# then times both.
+#
+# python3 benchmarks/output_tags.py [lines]
+
+import os, sys, time, re, random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from jinjafx import JinjaFx
+
+def reference(content, use_oformat):
+  outputs = {}
+  blanks = {}
+  stack = ['0:_stdout_']
+  start_tag = re.compile(r'<output(' + (r':\S+' if use_oformat else '') + r')?[\t ]+(.+?)[\t ]*>(?:\[(-?\d+)\])?', re.IGNORECASE)
+  end_tag = re.compile(r'</output[\t ]*(\\n[\t ]*)?>', re.IGNORECASE)
+  clines = content.splitlines()
+
+  i = 0
+  while i < len(clines):
+    l = clines[i]
+
+    if block_begin := start_tag.search(l.strip()):
+      if block_begin.start() != 0:
+        clines[i:i + 1] = [l[:block_begin.start()], l[block_begin.start():]]
+        continue
+
+      if block_begin.end() != len(l.strip()):
+        clines[i:i + 1] = [l[:block_begin.end()], l[block_begin.end():]]
+        continue
+
+      oname = block_begin.group(2)
+      if oname.startswith(('"', "'")) or oname.endswith(('"', "'")):
+        oname = oname[1:-1].strip()
+
+      index = int(block_begin.group(3)) if block_begin.group(3) is not None else 0
+      oformat = block_begin.group(1) if block_begin.group(1) else (':text' if use_oformat else '')
+      stack.append(str(index) + ':' + oname.strip() + oformat.lower())
+
+    elif block_end := end_tag.search(l.strip()):
+      if block_end.start() != 0:
+        clines[i:i + 1] = [l[:block_end.start()], l[block_end.start():]]
+        continue
+
+      if block_end.end() != len(l.strip()):
+        clines[i:i + 1] = [l[:block_end.end()], l[block_end.end():]]
+        continue
+
+      if block_end.group(1):
+        blanks[stack[-1]] = True
+
+      stack.pop()
+
+    else:
+      outputs.setdefault(stack[-1], []).append(l)
+
+    i += 1
+
+  merged = {}
+  for o in sorted(outputs, key=lambda x: int(x.split(':')[0])):
+    merged.setdefault(o.split(':', 1)[1], []).extend(outputs[o] + ([' '] if o in blanks else []))
+
+  return { k: v for k, v in merged.items() if len(''.join(v).strip()) }
+
+def generate(lines, use_oformat):
+  rnd = random.Random(lines)
+  fmt = lambda: rnd.choice([':text', ':HTML', ':markdown']) if use_oformat else ''
+  out = []
+
+  while len(out) < lines:
+    r = rnd.random()
+    name = f'out{rnd.randrange(20)}.txt'
+
+    if r < 0.01:
+      out.append(f'<output{fmt()} "{name}">[{rnd.randrange(-2, 3)}]')
+      out.extend(f'  block line {len(out)} {{x}}' for i in range(rnd.randrange(1, 20)))
+      out.append(rnd.choice(['</output>', '</output\\n>', '</OUTPUT >']))
+
+    elif r < 0.25:
+      out.append(f'before {len(out)} <output{fmt()} {name}>inline {len(out)}</output> after')
+
+    elif r < 0.26:
+      out.append(f"<output{fmt()} '{name}'>")
+      out.append(f'outer {len(out)} <output "nested{rnd.randrange(3)}.txt">[1]inner</output\\n> tail')
+      out.append('</output>')
+
+    else:
+      out.append(f'line {len(out)} ' + 'x' * rnd.randrange(60))
+
+  return '\n'.join(out) + '\n'
+
+def main():
+  lines = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+
+  with JinjaFx.Engine() as engine:
+    for use_oformat in (False, True):
+      content = generate(lines, use_oformat)
+
+      t = time.perf_counter()
+      expected = reference(content, use_oformat)
+      tref = time.perf_counter() - t
+
+      t = time.perf_counter()
+      outputs = engine.render('{{ content }}', None, { 'content': content }, use_oformat=use_oformat)
+      tnew = time.perf_counter() - t
+
+      outputs.pop('_stderr_')
+      assert outputs == expected, f'outputs differ (use_oformat={use_oformat})'
+      print(f'{lines} lines, {len(expected)} outputs (use_oformat={use_oformat}): per line parser {tref:.2f}s, single pass parser {tnew:.2f}s')
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+
+# Checks that changes a template makes to global variables in one data row
+# aren't visible to the next (each row must render as if it was the only
+# row) and that the vars passed in are left untouched, then times read only
+# and mutating templates with a large vars dict.
+#
+# python3 benchmarks/row_isolation.py [hosts]
+
+import os, sys, time, copy, yaml
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from jinjafx import JinjaFx
+
+VARS = '''
+d: { a: [1, 2, { x: 1 }], b: { c: [3] } }
+l: [[1], { k: [2] }, 3]
+s: !!set { a, b }
+base: &b { z: [9] }
+r1: *b
+r2: *b
+dt: 2020-01-01
+'''
+
+TEMPLATES = [
+  '{% do d.a.append(A) %}{% do d.b.c.append(A) %}{{ d }}',
+  '{% do l[0].append(A) %}{% do l[1].k.append(A) %}{{ l }} {{ l[1:] }}',
+  '{% for x in l %}{% if x is mapping %}{% do x.k.append(A) %}{% endif %}{% endfor %}{{ l }}',
+  '{% for k, v in d.items() %}{% if v is mapping %}{% do v.update({"n": A}) %}{% endif %}{% endfor %}{{ d }}',
+  '{% do r1.z.append(A) %}{{ r2 }} {{ r1 | to_yaml }}',
+  '{% set c = d.copy() %}{% do c.a.append(A) %}{{ d.a }}',
+  '{% do (l | first).append(A) %}{{ l }}',
+  '{% do (l | list)[0].append(A) %}{{ l }}',
+  '{% do d["a"].append(A) %}{% do d["b"]["c"].extend([A, A]) %}{{ d }}',
+  '{% do lookup("vars", "d").a.append(A) %}{{ d.a }}',
+  '{% do d.setdefault("a", []).append(A) %}{% do d.pop("b").c.append(A) %}{{ d }}',
+  '{% do d.a.__setitem__(0, A) %}{% do d.__delitem__("b") %}{{ d }}',
+  '{% do s.add(A) %}{{ s | sort }}',
+  '{% set n = namespace(v=d) %}{% do n.v.a.append(A) %}{{ d.a }}',
+  '{{ jinjafx.setg("x", d) }}{% do jinjafx.getg("x").a.append(A) %}{{ d.a }}',
+  '{{ d.__class__.__name__ }} {{ l.__class__.__name__ }} {{ d | to_nice_yaml }} {{ l | tojson }} {{ dt }}'
+]
+
+def main():
+  nhosts = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+  rows = ['1', '2', '3', '4']
+
+  with JinjaFx.Engine() as engine:
+    for template in TEMPLATES:
+      gvars = yaml.safe_load(VARS)
+      original = copy.deepcopy(gvars)
+
+      outputs = engine.render(template, 'A\n' + '\n'.join(rows) + '\n', gvars)['_stdout_']
+      expected = sum((engine.render(template, f'A\n{r}\n', yaml.safe_load(VARS))['_stdout_'] for r in rows), [])
+
+      assert outputs == expected, f'rows not isolated: {template}'
+      assert gvars == original, f'vars modified: {template}'
+
+    print(f'{len(TEMPLATES)} templates: OK')
+
+    gvars = { 'hosts': { f'h{i}': { 'ip': f'10.0.{i // 256}.{i % 256}', 'vlans': list(range(20)), 'tags': { 'a': 1, 'b': [1, 2] } } for i in range(nhosts) }, 'l': [] }
+    data = 'A\n' + '\n'.join(str(i) for i in range(200)) + '\n'
+
+    for name, template in (('read only', '{{ A }} {{ hosts["h" ~ A].ip }}'), ('mutating', '{% do l.append(A) %}{% do hosts["h" ~ A].vlans.append(A) %}{{ l }}')):
+      t = time.perf_counter()
+      engine.render(template, data, gvars)
+      print(f'{nhosts} hosts, 200 {name} rows: {time.perf_counter() - t:.2f}s')
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+
+# Checks the SNMPv3 key filters in ext_jinjafx against the RFC 3414 (A.3)
+# test vectors and a naive 1 MB expansion, then times them with and
+# without the expanded key cache.
+#
+# python3 benchmarks/snmpv3_keys.py [count]
+
+import os, sys, time, hashlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from jinjafx import JinjaFx
+
+def naive_key(password, engineid, algorithm):
+  ekey = hashlib.new(algorithm, ((password * (1048576 // len(password))) + password[:1048576 % len(password)]).encode('utf-8')).digest()
+  return hashlib.new(algorithm, ekey + bytes.fromhex(engineid) + ekey).hexdigest()
+
+def render(engine, template, gvars):
+  return '\n'.join(engine.render(template, None, gvars)['_stdout_'])
+
+def main():
+  count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+
+  with JinjaFx.Engine() as engine:
+    import ext_jinjafx
+
+    vectors = [
+      ('maplesyrup', '000000000000000000000002', 'md5', '526f5eed9fcce26f8964c2930787d82b'),
+      ('maplesyrup', '000000000000000000000002', 'sha1', '6695febc9288e36282235fc7151f128497b38f3f')
+    ]
+
+    for password, engineid, algorithm, expected in vectors:
+      for cached in (False, True):
+        if not cached:
+          ext_jinjafx.plugin.clear_cache()
+
+        gvars = { 'p': password, 'e': engineid, 'a': algorithm }
+        assert render(engine, '{{ p | arista_snmpv3_key(e, a) }}', gvars) == expected, (password, algorithm, cached)
+        assert render(engine, '{{ p | cisco_snmpv3_key(e, a) }}', gvars).replace(':', '') == expected, (password, algorithm, cached)
+
+    passwords = ['a', 'maplesyrup', 'pässwörd☃', 'x' * 64, 'y' * 1000, 'z' * 70000]
+
+    for password in passwords:
+      for algorithm in ('md5', 'sha1', 'sha256'):
+        gvars = { 'p': password, 'e': '80001f8880c71100000a000000', 'a': algorithm }
+        expected = naive_key(password, gvars['e'], algorithm)
+        ext_jinjafx.plugin.clear_cache()
+        assert render(engine, '{{ p | arista_snmpv3_key(e, a) }}', gvars) == expected, (password[:16], algorithm)
+        assert render(engine, '{{ p | arista_snmpv3_key(e, a) }}', gvars) == expected, (password[:16], algorithm)
+
+    print('RFC 3414 vectors and naive expansion: OK')
+
+    data = 'ENGINEID\n' + ''.join('80001f8880%024x\n' % i for i in range(count))
+    template = '{{ "maplesyrup" | cisco_snmpv3_key(ENGINEID) }}'
+
+    t = time.perf_counter()
+    for i in range(count):
+      naive_key('maplesyrup', '80001f8880%024x' % i, 'sha1')
+    print(f'naive expansion: {count} keys in {time.perf_counter() - t:.2f}s')
+
+    ext_jinjafx.plugin.cache_size = 0
+    t = time.perf_counter()
+    engine.render(template, data)
+    print(f'incremental expansion (uncached): {count} keys in {time.perf_counter() - t:.2f}s')
+
+    ext_jinjafx.plugin.cache_size = 1024
+    t = time.perf_counter()
+    engine.render(template, data)
+    print(f'incremental expansion (cached): {count} keys in {time.perf_counter() - t:.2f}s')
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+
+# Checks that templated global variables give the same result when only the
+# templated string values are rendered as when the whole of vars is dumped,
+# rendered and reloaded (forced by adding a variable containing a Jinja2
+# comment), then times both with a large vars file where only some of the
+# values are templated.
+#
+# python3 benchmarks/vars_render.py [hosts]
+
+import os, sys, time, yaml
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from jinjafx import JinjaFx
+
+VARS = r'''
+site: lon
+asn: 65000
+date: 2024-01-01
+nothing: ~
+domain: '{{ site }}.example.net'
+count: '{{ 40 + 2 }}'
+ratio: '{{ 1 / 4 }}'
+flag: '{{ asn > 1 }}'
+answer: '{{ "yes" }}'
+number: '{{ "1e3" }}'
+mapping: '{{ "{a: 1, b: [2, 3]}" }}'
+sequence: '{{ "[x, y]" }}'
+colon: '{{ "key: value" }}'
+hash: '{{ "value # not a comment" }}'
+dq: '"'
+nl: "\n"
+quotes: '{{ "with " ~ dq ~ "double" ~ dq ~ " quotes" }}'
+multiline: '{{ ["line 1", "line 2"] | join(nl) }}'
+city: Zürich ☃
+unicode: '{{ city }} / {{ site }}'
+empty: '{{ "" }}'
+ntp: ['10.0.0.1', '{{ "10.0.0." ~ (1 + 1) }}', 3]
+nested:
+  a: { b: ['{{ site | upper }}', { c: '{{ asn * 2 }}' }] }
+  d: plain string
+'''
+
+def main():
+  nhosts = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+
+  gvars = yaml.safe_load(VARS)
+  gvars['hosts'] = { f'h{i}': { 'name': f'{{{{ site }}}}-h{i}' if i % 100 == 0 else f'lon-h{i}', 'ip': f'10.{i // 256 % 256}.{i % 256}.1', 'vlans': list(range(10)), 'asn': '{{ asn + %d }}' % i if i % 100 == 0 else 65000 + i } for i in range(nhosts) }
+  keys = [k for k in gvars]
+  template = '\n'.join(f'{k}: {{{{ {k} }}}} {{{{ {k}.__class__.__name__ }}}}' for k in keys)
+
+  with JinjaFx.Engine() as engine:
+    t = time.perf_counter()
+    fast = engine.render(template, None, gvars)
+    tfast = time.perf_counter() - t
+
+    t = time.perf_counter()
+    slow = engine.render(template, None, { **gvars, 'jinjafx_benchmark': '{# force the full render #}' })
+    tslow = time.perf_counter() - t
+
+  assert fast == slow, 'rendering only the templated values differs from the full render'
+  print(f'{nhosts} hosts: full render {tslow:.2f}s, templated values only {tfast:.2f}s')
+
+if __name__ == '__main__':
+  main()
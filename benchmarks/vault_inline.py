@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+
+# Checks that a vars file containing inline !vault values renders the same
+# output via the CLI as the equivalent plaintext vars file, then compares
+# the time taken with decrypting the values one after another.
+#
+# python3 benchmarks/vault_inline.py [values]
+
+import os, sys, time, json, subprocess, tempfile
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+
+from jinjafx import AnsibleVault
+
+def vaulted(vault, s, indent):
+  return '!vault |\n' + ''.join(indent + l + '\n' for l in vault.encrypt(s.encode('utf-8'), 'password').splitlines())
+
+def jinjafx(*args, cwd=None):
+  env = dict(os.environ, PYTHONPATH=root, ANSIBLE_VAULT_PASSWORD='password')
+  t = time.perf_counter()
+  p = subprocess.run([sys.executable, '-m', 'jinjafx'] + list(args), cwd=cwd, env=env, capture_output=True, text=True)
+  assert p.returncode == 0, p.stderr
+  return p.stdout, time.perf_counter() - t
+
+def main():
+  nvalues = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+  vault = AnsibleVault()
+  secrets = [f'secret {i} ' + 'x' * (i % 50) for i in range(nvalues)]
+
+  with tempfile.TemporaryDirectory() as tmpdir:
+    for name, value in (('plain.yml', lambda s, indent: json.dumps(s) + '\n'), ('vault.yml', lambda s, indent: vaulted(vault, s, indent))):
+      with open(os.path.join(tmpdir, name), 'wt') as f:
+        f.write('secrets:\n')
+        for i, s in enumerate(secrets[:nvalues // 2]):
+          f.write(f'  s{i}: ' + value(s, '    '))
+
+        f.write('listed:\n')
+        for s in secrets[nvalues // 2:]:
+          f.write('  - ' + value(s, '    '))
+
+        f.write('nested: { plain: "x", derived: "{{ secrets.s0 }}-derived" }\n')
+
+    with open(os.path.join(tmpdir, 'template.j2'), 'wt') as f:
+      f.write('{% for k, v in secrets.items() %}{{ k }}={{ v }}\n{% endfor %}{{ listed | join("\\n") }}\n{{ nested }}\n')
+
+    expected, tplain = jinjafx('-t', 'template.j2', '-g', 'plain.yml', cwd=tmpdir)
+    output, tvault = jinjafx('-t', 'template.j2', '-g', 'vault.yml', cwd=tmpdir)
+    assert output == expected, 'output with inline !vault values differs from the plaintext vars'
+
+  vaults = [vault.encrypt(s.encode('utf-8'), 'password').encode('utf-8') for s in secrets]
+  AnsibleVault.clear_cache()
+
+  t = time.perf_counter()
+  for v in vaults:
+    vault.decrypt(v, 'password')
+  tserial = time.perf_counter() - t
+
+  print(f'{nvalues} inline !vault values: serial decrypt {tserial:.2f}s, CLI render {tvault:.2f}s (plaintext vars {tplain:.2f}s) using {os.cpu_count()} CPUs')
+
+if __name__ == '__main__':
+  main()
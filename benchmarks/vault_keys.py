@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+
+# Checks that AnsibleVault gives the same plaintext with and without its
+# derived key cache (and that a cached key is never used for a different
+# password), then times decrypting the same values repeatedly with a cold
+# and a warm cache.
+#
+# python3 benchmarks/vault_keys.py [values] [repeats]
+
+import os, sys, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from jinjafx import AnsibleVault
+
+def main():
+  nvalues = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+  repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+  vault = AnsibleVault()
+  plaintexts = [os.urandom(i % 97) + f'value {i}'.encode('utf-8') for i in range(nvalues)]
+  vaults = [vault.encrypt(p, 'password').encode('utf-8') for p in plaintexts]
+
+  t = time.perf_counter()
+  for r in range(repeats):
+    for v, p in zip(vaults, plaintexts):
+      AnsibleVault.clear_cache()
+      assert vault.decrypt(v, 'password') == p, 'uncached decrypt differs'
+  tcold = time.perf_counter() - t
+
+  t = time.perf_counter()
+  for r in range(repeats):
+    for v, p in zip(vaults, plaintexts):
+      assert vault.decrypt(v, 'password') == p, 'cached decrypt differs'
+  twarm = time.perf_counter() - t
+
+  for v in vaults[:5]:
+    assert vault.decrypt(v, 'wrong password', return_none=True) is None, 'cached key used for a different password'
+
+  print(f'{nvalues} values x {repeats}: uncached {tcold:.2f}s, cached {twarm:.2f}s')
+
+if __name__ == '__main__':
+  main()
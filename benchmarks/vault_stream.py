@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+
+# Checks that AnsibleVault().encrypt_stream() produces byte identical vault
+# text to encrypt() for the same salt, and that decrypt_stream() and
+# decrypt() round trip, across sizes and chunk sizes around the block,
+# line and chunk boundaries, then compares the time and peak memory of
+# both for a large file.
+#
+# python3 benchmarks/vault_stream.py [megabytes]
+
+import os, sys, io, time, tempfile, tracemalloc
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from jinjafx import AnsibleVault
+
+def main():
+  megabytes = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+  vault = AnsibleVault()
+  salt = os.urandom(32)
+
+  for size in (0, 1, 15, 16, 17, 39, 40, 41, 4095, 65536, 1024 * 1024 - 1, 1024 * 1024 + 1, 3 * 1024 * 1024 + 5):
+    b_plaintext = os.urandom(size)
+
+    for chunk_size in (7, 40, 65536, 1024 * 1024):
+      with mock.patch('os.urandom', return_value=salt):
+        expected = vault.encrypt(b_plaintext, 'password').encode('utf-8')
+        fout = io.BytesIO()
+        vault.encrypt_stream(io.BytesIO(b_plaintext), fout, 'password', chunk_size=chunk_size)
+
+      assert fout.getvalue() == expected, f'encrypt_stream() differs from encrypt() (size {size}, chunk size {chunk_size})'
+
+      fout = io.BytesIO()
+      vault.decrypt_stream(io.BytesIO(expected), fout, 'password', chunk_size=chunk_size)
+      assert fout.getvalue() == b_plaintext, f'decrypt_stream() differs (size {size}, chunk size {chunk_size})'
+      assert vault.decrypt(expected, 'password') == b_plaintext, f'decrypt() differs (size {size})'
+
+  print('encrypt_stream() and decrypt_stream() match encrypt() and decrypt(): OK')
+
+  with tempfile.TemporaryDirectory() as tmpdir:
+    plain, encrypted, decrypted = (os.path.join(tmpdir, f) for f in ('plain', 'encrypted', 'decrypted'))
+
+    with open(plain, 'wb') as f:
+      for i in range(megabytes):
+        f.write(os.urandom(1024 * 1024))
+
+    def measure(fn):
+      tracemalloc.start()
+      t = time.perf_counter()
+      fn()
+      elapsed = time.perf_counter() - t
+      peak = tracemalloc.get_traced_memory()[1]
+      tracemalloc.stop()
+      return f'{elapsed:.2f}s, peak {peak / 1048576:.0f}MB'
+
+    def encrypt():
+      with open(plain, 'rb') as fin, open(encrypted, 'wb') as fout:
+        fout.write(vault.encrypt(fin.read(), 'password').encode('utf-8'))
+
+    def encrypt_stream():
+      with open(plain, 'rb') as fin, open(encrypted, 'wb') as fout:
+        vault.encrypt_stream(fin, fout, 'password')
+
+    def decrypt():
+      with open(encrypted, 'rb') as fin, open(decrypted, 'wb') as fout:
+        fout.write(vault.decrypt(fin.read(), 'password'))
+
+    def decrypt_stream():
+      with open(encrypted, 'rb') as fin, open(decrypted, 'wb') as fout:
+        vault.decrypt_stream(fin, fout, 'password')
+
+    print(f'{megabytes}MB encrypt: in memory {measure(encrypt)}, streamed {measure(encrypt_stream)}')
+    print(f'{megabytes}MB decrypt: in memory {measure(decrypt)}, streamed {measure(decrypt_stream)}')
+
+    with open(plain, 'rb') as f1, open(decrypted, 'rb') as f2:
+      assert f1.read() == f2.read(), 'streamed round trip differs'
+
+if __name__ == '__main__':
+  main()
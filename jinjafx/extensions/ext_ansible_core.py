@@ -21,7 +21,7 @@ from jinja2.filters import do_unique
 from jinja2.utils import pass_environment
 from collections.abc import Sequence, Hashable
 from urllib.parse import urlsplit
-from jinjafx import JinjaFx
+from jinjafx import JinjaFx, _yaml_loader
 
 import re, base64, hashlib, yaml, json, datetime, time, math, random, itertools
 
@@ -83,7 +83,7 @@ class plugin(Extension):
 
   def __from_yaml(self, data):
     if isinstance(data, str):
-      return yaml.load(data, Loader=yaml.SafeLoader)
+      return yaml.load(data, Loader=_yaml_loader)
     return data
 
   def __to_json(self, a, *args, **kw):
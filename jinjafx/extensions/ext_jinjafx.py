@@ -20,9 +20,13 @@ from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 from cryptography.hazmat.primitives.kdf.scrypt import Scrypt
 from jinjafx import JinjaFx, Vaulty
 
-import os, base64, random, re, hashlib, ipaddress
+import os, base64, random, re, hashlib, ipaddress, collections, threading
 
 class plugin(Extension):
+  cache_size = 1024
+  __kcache = collections.OrderedDict()
+  __klock = threading.Lock()
+
   def __init__(self, environment):
     Extension.__init__(self, environment)
     
@@ -45,11 +49,41 @@ class plugin(Extension):
     environment.filters['summarize_address_range'] = self.__summarize_address_range
     environment.filters['vaulty_encrypt'] = self.__vaulty.encrypt
     environment.filters['vaulty_decrypt'] = self.__vaulty.decrypt
+    environment.filters['vaulty_encrypt_batch'] = self.__vaulty.encrypt_batch
+    environment.filters['vaulty_decrypt_batch'] = self.__vaulty.decrypt_batch
+
+  @classmethod
+  def clear_cache(cls):
+    with cls.__klock:
+      cls.__kcache.clear()
 
   def __expand_snmpv3_key(self, password, algorithm):
+    ckey = (hashlib.sha256(password.encode('utf-8')).digest(), algorithm)
+
+    with self.__klock:
+      if (ekey := self.__kcache.get(ckey)) is not None:
+        self.__kcache.move_to_end(ckey)
+        return ekey
+
     h = hashlib.new(algorithm)
-    h.update(((password * (1048576 // len(password))) + password[:1048576 % len(password)]).encode('utf-8'))
-    return h.digest()
+    b_password = password.encode('utf-8')
+    count, remainder = divmod(1048576, len(password))
+    repeat = max(1, 65536 // len(b_password))
+    b_block = b_password * repeat
+
+    for i in range(count // repeat):
+      h.update(b_block)
+
+    h.update(b_password * (count % repeat) + password[:remainder].encode('utf-8'))
+    ekey = h.digest()
+
+    with self.__klock:
+      self.__kcache[ckey] = ekey
+
+      while len(self.__kcache) > max(0, self.cache_size):
+        self.__kcache.popitem(last=False)
+
+    return ekey
 
   def __cisco_snmpv3_key(self, password, engineid, algorithm='sha1'):
     ekey = self.__expand_snmpv3_key(password, algorithm)
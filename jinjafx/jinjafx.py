@@ -19,7 +19,7 @@ import sys
 if sys.version_info < (3, 10):
   sys.exit('Requires Python >= 3.10')
 
-import os, io, importlib.util, importlib.metadata, argparse, re, getpass, datetime, copy
+import os, io, time, array, itertools, functools, concurrent.futures, importlib.abc, importlib.machinery, importlib.util, importlib.metadata, argparse, re, getpass, datetime, copy, threading, hashlib, collections, collections.abc
 import jinja2, jinja2.sandbox, yaml, zoneinfo, base64, tempfile, shutil, json, jsonschema
 
 from cryptography.hazmat.primitives import hashes
@@ -34,7 +34,7 @@ from cryptography.hazmat.primitives.ciphers.aead import ChaCha20Poly1305
 from cryptography.exceptions import InvalidSignature
 from cryptography.exceptions import InvalidTag
 
-__version__ = '1.27.6'
+__version__ = '1.28.0'
 
 __all__ = ['JinjaFx', 'AnsibleVault', 'Vaulty']
 
@@ -49,7 +49,7 @@ def main():
     prog = os.path.basename(sys.argv[0])
     jinjafx_usage = '-t <template.j2> [-d [<data.csv>]] [-g <vars.(yml|json)>]\n'
     jinjafx_usage += (' ' * (len(prog) + 3)) + '-dt <dt.yml> [-ds <dataset>] [-d [<data.csv>]] [-g <vars.(yml|json)>]\n'
-    jinjafx_usage += (' ' * (len(prog) + 3)) + '-encrypt/-decrypt [<file1>] [<file2>] [..]\n'
+    jinjafx_usage += (' ' * (len(prog) + 3)) + '-encrypt/-decrypt [<file1>] [<file2>] [..] [-j <workers>]\n'
     jinjafx_usage += '''
 
     -t <template.j2>          - specify a Jinja2 template
@@ -62,6 +62,8 @@ def main():
     -ed <exts dir> [-ed ..]   - specify where to look for extensions (default is "." and "~/.jinjafx")
     -o <output file>          - specify the output file (supports Jinja2 variables) (default is stdout)
     -od <output dir>          - set output dir for output files with a relative path (default is ".")
+    -cd [<cache dir>]         - cache compiled templates between runs (default is "~/.jinjafx/cache")
+    -j <workers>              - render data rows or encrypt/decrypt files in parallel (default for files is cpu count)
     -encrypt [<file>] [..]    - encrypt files or stdin (if file omitted) using Ansible Vault
     -decrypt [<file>] [..]    - decrypt files or stdin (if file omitted) using Ansible Vault
     -m                        - merge duplicate global variables (dicts and lists) instead of replacing
@@ -69,7 +71,8 @@ def main():
 
 Environment Variables:
   ANSIBLE_VAULT_PASSWORD       - specify an Ansible Vault password
-  ANSIBLE_VAULT_PASSWORD_FILE  - specify an Ansible Vault password file'''
+  ANSIBLE_VAULT_PASSWORD_FILE  - specify an Ansible Vault password file
+  JINJAFX_CACHE_DIR            - specify a cache dir for compiled templates (same as -cd)'''
 
     parser = __ArgumentParser(add_help=False, usage=f'{prog} {jinjafx_usage}')
     group_ex = parser.add_mutually_exclusive_group(required=True)
@@ -84,6 +87,8 @@ Environment Variables:
     parser.add_argument('-ed', type=str, action='append', default=[])
     parser.add_argument('-o', type=str)
     parser.add_argument('-od', type=str)
+    parser.add_argument('-cd', type=str, nargs='?', const='')
+    parser.add_argument('-j', type=int)
     parser.add_argument('-m', action='store_true')
     parser.add_argument('-q', action='store_true')
     args = parser.parse_args()
@@ -97,6 +102,9 @@ Environment Variables:
     if args.od is not None and not os.access(args.od, os.W_OK):
       parser.error('argument -od: unable to write to output directory')
 
+    if args.j is not None and args.j < 1:
+      parser.error('argument -j: must be a positive integer')
+
     gvars = {}
     data = None
     vpw = [None]
@@ -113,28 +121,7 @@ Environment Variables:
 
       else:
         __get_vault_credentials(vpw, True)
-
-        for f in args.encrypt:
-          if os.path.isfile(f):
-            print(f'Encrypting {f}... ', flush=True, end='')
-
-            try:
-              with open(f, 'rb') as fh:
-                vtext = AnsibleVault().encrypt(fh.read(), vpw[0])
-
-              with open(f, 'wb') as fh:
-                fh.write(vtext.encode('utf-8'))
-                print('ok')
-
-            except Exception as e:
-              print('failed')
-              print(f'error: {e}', file=sys.stderr)
-
-          elif not os.path.exists(f):
-            print(f'Encrypting {f}... not found')
-
-          else:
-            print(f'Encrypting {f}... unsupported')
+        __vault_files(args.encrypt, True, vpw[0], args.j)
 
     elif args.decrypt is not None:
       if not args.decrypt:
@@ -144,44 +131,67 @@ Environment Variables:
 
       else:
         __get_vault_credentials(vpw)
-
-        for f in args.decrypt:
-          if os.path.isfile(f):
-            print(f'Decrypting {f}... ', flush=True, end='')
-
-            try:
-              with open(f, 'rb') as fh:
-                plaintext = AnsibleVault().decrypt(fh.read(), vpw[0])
-
-              with open(f, 'wb') as fh:
-                fh.write(plaintext)
-                print('ok')
-
-            except Exception as e:
-              print('failed')
-              print(f'error: {e}', file=sys.stderr)
-
-          elif not os.path.exists(f):
-            print(f'Decrypting {f}... not found')
-
-          else:
-            print(f'Decrypting {f}... unsupported')
+        __vault_files(args.decrypt, False, vpw[0], args.j)
 
     else:
       vault_undef = False
+      vaults = {}
 
       def yaml_vault_tag(loader, node):
-        x = __decrypt_vault(vpw, node.value, vault_undef)
+        if (x := vaults.get(node.value)) is not None:
+          x = x.result()
+
+        else:
+          x = __decrypt_vault(vpw, node.value, vault_undef)
+
         if x is not None:
           return x.decode('utf-8')
 
         else:
           return '_undef'
 
+      def yaml_vault_load(stream):
+        loader = _yaml_loader(stream)
+        vaults.clear()
+
+        try:
+          if (node := loader.get_single_node()) is not None:
+            nodes = [node]
+            seen = set()
+
+            while nodes:
+              if id(n := nodes.pop()) not in seen:
+                seen.add(id(n))
+
+                if isinstance(n, yaml.MappingNode):
+                  nodes.extend(itertools.chain.from_iterable(n.value))
+
+                elif isinstance(n, yaml.SequenceNode):
+                  nodes.extend(n.value)
+
+                elif n.tag == '!vault':
+                  vaults[n.value] = None
+
+            if len(vaults) > 1:
+              __get_vault_credentials(vpw)
+
+              with concurrent.futures.ThreadPoolExecutor() as executor:
+                for v in vaults:
+                  vaults[v] = executor.submit(__decrypt_vault, vpw, v, vault_undef)
+
+            else:
+              vaults.clear()
+
+            return loader.construct_document(node)
+
+        finally:
+          loader.dispose()
+          vaults.clear()
+
       if args.dt is not None:
         with open(args.dt.name, 'rt') as f:
           try:
-            dt = yaml.load(f.read(), Loader=yaml.SafeLoader)['dt']
+            dt = yaml.load(f.read(), Loader=_yaml_loader)['dt']
 
           except Exception as e:
             exc_source = args.dt.name
@@ -221,12 +231,12 @@ Environment Variables:
           if 'data' in dt:
             data = dt['data']
 
-          yaml.add_constructor('!vault', lambda x, y: None, yaml.SafeLoader)
+          yaml.add_constructor('!vault', lambda x, y: None, _yaml_loader)
 
           if gv:
             try:
               if 'jinjafx_vault_undefined' in gv:
-                if y := yaml.load(gv, Loader=yaml.SafeLoader):
+                if y := yaml.load(gv, Loader=_yaml_loader):
                   vault_undef = y.get('jinjafx_vault_undefined', vault_undef)
 
             except Exception as e:
@@ -236,18 +246,18 @@ Environment Variables:
           if 'vars' in dt:
             try:
               if 'jinjafx_vault_undefined' in dt['vars']:
-                if y := yaml.load(dt['vars'], Loader=yaml.SafeLoader):
+                if y := yaml.load(dt['vars'], Loader=_yaml_loader):
                   vault_undef = y.get('jinjafx_vault_undefined', vault_undef)
 
             except Exception as e:
               exc_source = 'dt:vars'
               raise
 
-          yaml.add_constructor('!vault', yaml_vault_tag, yaml.SafeLoader)
+          yaml.add_constructor('!vault', yaml_vault_tag, _yaml_loader)
 
           if gv:
             try:
-              if y := yaml.load(gv, Loader=yaml.SafeLoader):
+              if y := yaml_vault_load(gv):
                 if isinstance(y, list):
                   y = {'_': y}
 
@@ -259,7 +269,7 @@ Environment Variables:
 
           if 'vars' in dt:
             try:
-              if y := yaml.load(dt['vars'], Loader=yaml.SafeLoader):
+              if y := yaml_vault_load(dt['vars']):
                 if isinstance(y, list):
                   y = {'_': y}
 
@@ -292,7 +302,7 @@ Environment Variables:
       if args.g is not None:
         fcontents = {}
 
-        yaml.add_constructor('!vault', lambda x, y: None, yaml.SafeLoader)
+        yaml.add_constructor('!vault', lambda x, y: None, _yaml_loader)
 
         for g in args.g:
           with open(g.name, 'rt') as f:
@@ -300,18 +310,18 @@ Environment Variables:
 
           try:
             if b'jinjafx_vault_undefined' in fcontents[g.name]:
-              if y := yaml.load(fcontents[g.name], Loader=yaml.SafeLoader):
+              if y := yaml.load(fcontents[g.name], Loader=_yaml_loader):
                 vault_undef = y.get('jinjafx_vault_undefined', vault_undef)
 
           except Exception as e:
             exc_source = g.name
             raise
 
-        yaml.add_constructor('!vault', yaml_vault_tag, yaml.SafeLoader)
+        yaml.add_constructor('!vault', yaml_vault_tag, _yaml_loader)
 
         for g in args.g:
           try:
-            if y := yaml.load(fcontents[g.name], Loader=yaml.SafeLoader):
+            if y := yaml_vault_load(fcontents[g.name]):
               if isinstance(y, list):
                 y = {'_': y}
 
@@ -384,42 +394,50 @@ Environment Variables:
 
         gvars['jinjafx_input'] = jinjafx_input
 
+      if args.cd is None:
+        args.cd = os.getenv('JINJAFX_CACHE_DIR')
+
+      if args.cd is not None:
+        args.cd = os.path.abspath(os.path.expanduser(args.cd or '~/.jinjafx/cache'))
+        os.makedirs(args.cd, mode=0o700, exist_ok=True)
+
       args.ed = [os.getcwd(), os.getenv('HOME', '') + '/.jinjafx'] + args.ed
-      outputs = JinjaFx()._jinjafx(args.t, data, gvars, args.o, exts_dirs=args.ed)
-      ocount = 0
 
-      if args.od is not None:
-        os.chdir(args.od)
+      with JinjaFx.Engine(args.ed, bytecode_cache=args.cd) as engine, __OutputSpool(args.od) as spool:
+        for oname, index, lines in JinjaFx()._jinjafx_iter(args.t, data, gvars, args.o, engine=engine, workers=args.j):
+          spool.write(oname, index, lines)
 
-      if outputs['_stderr_']:
-        print('Warnings:', file=sys.stderr)
-        for w in outputs['_stderr_']:
-          print(f' - {w}', file=sys.stderr)
+        ocount = 0
+        outputs = spool.outputs()
 
-        print('', file=sys.stderr)
+        if args.od is not None:
+          os.chdir(args.od)
 
-      for o in sorted(sorted(outputs.items()), key=lambda x: (x[0] == '_stdout_')):
-        if o[0] != '_stderr_':
-          output = '\n'.join(o[1]) + '\n'
-          if output.strip():
-            if o[0] == '_stdout_':
-              if ocount:
-                print('\n-\n')
-              print(output)
+        if spool.warnings:
+          print('Warnings:', file=sys.stderr)
+          for w in spool.warnings:
+            print(f' - {w}', file=sys.stderr)
 
-            else:
-              ofile = re.sub(r'_+', '_', re.sub(r'[^A-Za-z0-9_. -/]', '_', os.path.normpath(o[0])))
+          print('', file=sys.stderr)
+
+        for o in outputs:
+          if o == '_stdout_':
+            if ocount:
+              print('\n-\n')
 
-              if os.path.dirname(ofile) != '':
-                if not os.path.isdir(os.path.dirname(ofile)):
-                  os.makedirs(os.path.dirname(ofile))
+            spool.copy(o, sys.stdout)
+            print()
+
+          else:
+            ofile = re.sub(r'_+', '_', re.sub(r'[^A-Za-z0-9_. -/]', '_', os.path.normpath(o)))
 
-              with open(ofile, 'wt') as f:
-                f.write(output)
+            if os.path.dirname(ofile) != '':
+              if not os.path.isdir(os.path.dirname(ofile)):
+                os.makedirs(os.path.dirname(ofile))
 
-              print(__format_bytes(len(output)) + ' > ' + os.path.abspath(ofile))
+            print(__format_bytes(spool.save(o, ofile)) + ' > ' + os.path.abspath(ofile))
 
-            ocount += 1
+          ocount += 1
 
       if ocount:
         if '_stdout_' not in outputs:
@@ -445,7 +463,7 @@ Environment Variables:
     if isinstance(e, jsonschema.ValidationError):
       error = _format_error(e, exc_source='vars.yml')
     else:
-      error = _format_error(e, 'template code', '_jinjafx', exc_source=exc_source)
+      error = _format_error(e, 'template code', '__render_rows', '_jinjafx', exc_source=exc_source)
 
     print(error.replace('__init__.py:', 'jinjafx.py:'), file=sys.stderr)
     sys.exit(-2)
@@ -511,6 +529,90 @@ def __get_vault_credentials(vpw, verify=False):
       print()
 
 
+def __vault_files(files, encrypt, password, workers=None):
+  action = 'Encrypt' if encrypt else 'Decrypt'
+  futures = []
+  last = {}
+  count = 0
+  total = 0
+  start = time.perf_counter()
+
+  with concurrent.futures.ThreadPoolExecutor(workers or os.cpu_count()) as executor:
+    for f in files:
+      if os.path.isfile(f):
+        rf = os.path.realpath(f)
+        last[rf] = executor.submit(__vault_file, rf, encrypt, password, last.get(rf))
+        futures.append(last[rf])
+
+      else:
+        futures.append(None)
+
+    for f, future in zip(files, futures):
+      if future is not None:
+        print(f'{action}ing {f}... ', flush=True, end='')
+
+        try:
+          total += future.result()
+          count += 1
+          print('ok')
+
+        except Exception as e:
+          print('failed')
+          print(f'error: {e}', file=sys.stderr)
+
+      elif not os.path.exists(f):
+        print(f'{action}ing {f}... not found')
+
+      else:
+        print(f'{action}ing {f}... unsupported')
+
+  if count:
+    elapsed = max(time.perf_counter() - start, 1e-6)
+    print(f'\n{action}ed {count} file{"s" if count > 1 else ""} ({__format_bytes(total)}) in {elapsed:.2f}s - {count / elapsed:.1f} files/s ({__format_bytes(total / elapsed)}/s)')
+
+
+def __vault_file(f, encrypt, password, previous=None):
+  if previous is not None:
+    previous.exception()
+
+  vault = AnsibleVault()
+
+  with open(f, 'rb') as fin:
+    size = os.fstat(fin.fileno()).st_size
+
+    try:
+      fd, tmp = tempfile.mkstemp(prefix='.jinjafx_', dir=os.path.dirname(f))
+
+    except OSError:
+      if encrypt:
+        b_output = vault.encrypt(fin.read(), password).encode('utf-8')
+
+      else:
+        b_output = vault.decrypt(fin.read(), password)
+
+      with open(f, 'wb') as fh:
+        fh.write(b_output)
+
+      return size
+
+    try:
+      with os.fdopen(fd, 'wb') as fout:
+        if encrypt:
+          vault.encrypt_stream(fin, fout, password)
+
+        else:
+          vault.decrypt_stream(fin, fout, password)
+
+      shutil.copymode(f, tmp)
+      os.replace(tmp, f)
+
+    except BaseException:
+      os.unlink(tmp)
+      raise
+
+  return size
+
+
 def __format_bytes(b):
   for u in [ '', 'k', 'M', 'G', 'T', 'P', 'E', 'Z', 'Y' ]:
     if b >= 1000:
@@ -547,25 +649,536 @@ class __ArgumentParser(argparse.ArgumentParser):
     raise Exception(message)
 
 
-class JinjaFx():
-  def _jinjafx(self, template, data, gvars, output, exts_dirs=None, sandbox=False, use_oformat=False):
-    self.__g_datarows = []
-    self.__g_dict = {}
-    self.__g_row = 0
-    self.__g_vars = {}
-    self.__g_filters = {}
-    self.__g_hostvars = {}
-    self.__g_warnings = []
-    self.__g_xlimit = 5000 if sandbox else 0
-    self.__g_hcounter = re.compile(r'(?:[A-Z]\.)+$', re.IGNORECASE)
+class __OutputSpool():
+  def __init__(self, directory=None, max_files=64, max_buffer=16 * 1024 * 1024):
+    self.__directory = os.path.abspath(directory) if directory is not None else None
+    self.__dir = None
+    self.__groups = {}
+    self.__count = 0
+    self.__content = {}
+    self.__files = collections.OrderedDict()
+    self.__max_files = max_files
+    self.__buffered = 0
+    self.__max_buffer = max_buffer
+    self.warnings = []
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *args):
+    self.__close()
+
+    if self.__dir is not None:
+      shutil.rmtree(self.__dir, ignore_errors=True)
+
+  def write(self, oname, index, lines):
+    if oname == '_stderr_':
+      self.warnings += lines
+
+    else:
+      if (g := self.__groups.setdefault(oname, {}).get(index)) is None:
+        g = self.__groups[oname][index] = [None, 0, []]
+
+      text = ''.join(l + '\n' for l in lines)
+      g[1] += len(text)
+      g[2].append(text)
+      self.__buffered += len(text)
+
+      if not self.__content.get(oname):
+        self.__content[oname] = bool(text.strip())
+
+      if self.__buffered > self.__max_buffer:
+        self.__spill()
+
+  def outputs(self):
+    self.__close()
+    return sorted(sorted(k for k, v in self.__content.items() if v), key=lambda x: (x == '_stdout_'))
+
+  def copy(self, oname, fh):
+    for path, size, buf in self.__parts(oname):
+      if path is not None:
+        with open(path, 'rt') as f:
+          shutil.copyfileobj(f, fh)
+
+      fh.write(''.join(buf))
+
+  def save(self, oname, ofile):
+    parts = self.__parts(oname)
+
+    if len(parts) == 1 and parts[0][0] is not None and not parts[0][2] and not os.path.exists(ofile):
+      try:
+        os.replace(parts[0][0], ofile)
+        return parts[0][1]
+
+      except OSError:
+        pass
+
+    with open(ofile, 'wt') as fh:
+      self.copy(oname, fh)
+
+    return sum(p[1] for p in parts)
+
+  def __parts(self, oname):
+    return [g for k, g in sorted(self.__groups[oname].items())]
+
+  def __mkdir(self):
+    if self.__directory is not None and any(o != '_stdout_' for o in self.__groups):
+      try:
+        return tempfile.mkdtemp(prefix='.jinjafx_', dir=self.__directory)
+
+      except OSError:
+        pass
+
+    return tempfile.mkdtemp(prefix='jinjafx_')
+
+  def __spill(self):
+    if self.__dir is None:
+      self.__dir = self.__mkdir()
+
+    for groups in self.__groups.values():
+      for g in groups.values():
+        if g[2]:
+          if g[0] is None:
+            g[0] = self.__dir + '/' + str(self.__count)
+            self.__count += 1
+
+          if (fh := self.__files.get(g[0])) is None:
+            while len(self.__files) >= self.__max_files:
+              self.__files.popitem(last=False)[1].close()
+
+            fh = self.__files[g[0]] = open(g[0], 'at')
+
+          else:
+            self.__files.move_to_end(g[0])
+
+          fh.write(''.join(g[2]))
+          g[2] = []
+
+    self.__buffered = 0
+
+  def __close(self):
+    while self.__files:
+      self.__files.popitem()[1].close()
+
+
+class _ExtensionFinder(importlib.abc.MetaPathFinder):
+  def __init__(self):
+    self.__paths = []
+    self.__lock = threading.Lock()
+
+  def add_paths(self, paths):
+    with self.__lock:
+      for p in map(os.path.abspath, paths):
+        if p not in self.__paths:
+          self.__paths = self.__paths + [p]
+
+  def find_spec(self, fullname, path=None, target=None):
+    if path is None:
+      return importlib.machinery.PathFinder.find_spec(fullname, self.__paths)
+
+
+_extension_finder = _ExtensionFinder()
+
+_expansion_ranges = re.compile(r'(?<!\\)\{[ \t]*([0-9]+-[0-9]+):([0-9]+)(:[0-9]+)?[ \t]*(?<!\\)\}')
+_expansion_classes = re.compile(r'(?<!\\)\[([A-Z0-9\-]+)(?<!\\)\]', re.IGNORECASE)
+
+
+# Compiles a pattern for jinjafx.expand() into (cost, program), where ranges are
+# kept as (start, stop, step, repeat) and only enumerated once the cost has been
+# checked against the expansion limit. None is returned for anything which
+# relies on the incremental behaviour of the fallback in __jfx_expand(), i.e.
+# unbalanced, nested or empty groups, more than 4096 group combinations, a
+# range with a zero step, an invalid class, stray brackets, a range or class
+# inside braces, or a range or class which spans a group boundary.
+@functools.lru_cache(maxsize=4096)
+def _expansion(s):
+  parens = list(re.finditer(r'(?<!\\)[()]', s))
+
+  if len(parens) % 2 or any(m.group() != '()'[i % 2] for i, m in enumerate(parens)):
+    return None
+
+  literals = []
+  alternatives = []
+  pos = 0
+
+  for i in range(0, len(parens), 2):
+    if parens[i + 1].start() == parens[i].end():
+      return None
+
+    literals.append(s[pos:parens[i].start()])
+    alternatives.append(re.split(r'(?<!\\)\|', s[parens[i].end():parens[i + 1].start()]))
+    pos = parens[i + 1].end()
+
+  literals.append(s[pos:])
+  combos = 1
+  cost = 0
+
+  for a in alternatives:
+    combos *= len(a)
+    cost += combos
+
+  if combos > 4096:
+    return None
+
+  program = []
+
+  for combo in itertools.product(*alternatives):
+    x = literals[0] + ''.join(a + l for a, l in zip(combo, literals[1:]))
+    nodes = []
+
+    for m in _expansion_ranges.finditer(x):
+      if m.start(1) - 1 != m.start() or m.end(m.lastindex) + 1 != m.end():
+        return None
+
+      e = list(map(int, m.group(1).split('-')))
+      end = e[1] + 1 if e[1] >= e[0] else e[1] - 1
+      step = int(m.group(2)) if end > e[0] else 0 - int(m.group(2))
+      repeat = int((m.group(3) or ':0')[1:])
+
+      if not step:
+        return None
+
+      nodes.append((m.start(), m.end(), m.group(), (e[0], end, step, repeat), len(range(e[0], end, step)) * (repeat + 1)))
+
+    for m in _expansion_classes.finditer(x):
+      if re.match(r'(?:[A-Z]-[^A-Z]|[a-z]-[^a-z]|[0-9]-[^0-9]|[^A-Za-z0-9]-)', m.group(1)):
+        return None
+
+      clist = []
+
+      for c in re.findall(r'([A-Z0-9](-[A-Z0-9])?)', m.group(1), re.IGNORECASE):
+        if c[1] != '':
+          start, end = ord(c[0][0]), ord(c[0][2])
+          clist += map(chr, range(start, end + 1) if end >= start else range(start, end - 1, -1))
+
+        else:
+          clist.append(c[0])
+
+      if not clist or not all(c.isascii() and c.isalnum() for c in clist):
+        return None
+
+      nodes.append((m.start(), m.end(), m.group(), tuple(clist), len(clist)))
+
+    blanked = x
+    for n in sorted(nodes, reverse=True):
+      blanked = blanked[:n[0]] + '\0' + blanked[n[1]:]
+
+    if re.search(r'(?<!\\)[\[\]]', blanked):
+      return None
+
+    braces = list(re.finditer(r'(?<!\\)[{}]', blanked))
+
+    if len(braces) % 2 or any(m.group() != '{}'[i % 2] for i, m in enumerate(braces)):
+      return None
+
+    if any('\0' in blanked[braces[i].end():braces[i + 1].start()] for i in range(0, len(braces), 2)):
+      return None
+
+    ordered = sorted(range(len(nodes)), key=lambda n: nodes[n][0])
+    pieces = []
+    pos = 0
+
+    for n in ordered:
+      pieces.append(re.sub(r'\\([\|\(\[\)\]])', r'\1', x[pos:nodes[n][0]]))
+      pos = nodes[n][1]
+
+    pieces.append(re.sub(r'\\([\|\(\[\)\]])', r'\1', x[pos:]))
+
+    xs = s
+    targets = []
+    size = 1
+
+    for n in nodes:
+      if (mpos := xs.find(n[2])) < 0:
+        return None
+
+      nob = len(re.findall(r'(?<!\\)\(', xs[:mpos]))
+      ncb = len(re.findall(r'(?<!\\)\)', xs[:mpos]))
+      xs = xs.replace(n[2], 'x', 1)
+      group = max(0, (nob - ncb) * nob)
+      targets.append(group - 1 if 0 < group <= len(alternatives) else -1)
+      size *= n[4]
+      cost += size
+
+    groups = tuple(re.sub(r'\\([\|\(\[\)\]])', r'\1', a) for a in combo)
+    program.append((len(nodes), tuple(pieces), tuple(ordered), groups, tuple(zip(targets, (n[2] for n in nodes))), tuple(n[3] for n in nodes)))
+
+  program.sort(key=lambda p: p[0])
+  return cost, tuple(p[1:] for p in program)
+
+
+_output_tags = {
+  o: re.compile(r'<output(' + (r':\S+' if o else '') + r')?[\t ]+(.+?)[\t ]*>(?:\[(-?\d+)\])?|</output[\t ]*(\\n[\t ]*)?>', re.IGNORECASE) for o in (False, True)
+}
+
+
+class _Environment(jinja2.Environment):
+  tracked = frozenset()
+  modified = {}
+
+  def track(self, obj):
+    memo = {}
+    obj = copy.deepcopy(obj, memo)
+    self.tracked = frozenset(id(v) for k, v in memo.items() if k != id(memo)) | { id(obj) }
+    self.modified = {}
+    return obj
+
+  def restore(self):
+    for obj, saved in self.modified.values():
+      obj.clear()
+
+      if isinstance(obj, collections.abc.MutableMapping):
+        obj.update(saved)
+
+      elif isinstance(obj, collections.abc.MutableSet):
+        obj |= saved
+
+      else:
+        obj.extend(saved)
+
+    self.modified = {}
+
+  def __modifies(self, obj, name):
+    if isinstance(name, str) and id(obj) in self.tracked and id(obj) not in self.modified:
+      if jinja2.sandbox.modifies_known_mutable(obj, name) or (name.startswith('__') and isinstance(obj, (collections.abc.MutableMapping, collections.abc.MutableSet, collections.abc.MutableSequence))):
+        self.modified[id(obj)] = (obj, copy.copy(obj))
+
+  def getattr(self, obj, attribute):
+    self.__modifies(obj, attribute)
+    return super().getattr(obj, attribute)
+
+  def getitem(self, obj, argument):
+    self.__modifies(obj, argument)
+    return super().getitem(obj, argument)
+
+
+class _SandboxedEnvironment(_Environment, jinja2.sandbox.SandboxedEnvironment):
+  pass
+
+
+_yaml_loader, _yaml_dumper = (yaml.CSafeLoader, yaml.CSafeDumper) if yaml.__with_libyaml__ else (yaml.SafeLoader, yaml.SafeDumper)
+
+
+class _DataTable():
+  def __init__(self, header, int_indices=(), float_indices=(), list_indices=()):
+    self.__header = header
+    self.__index = { f: i for i, f in enumerate(header) }
+    self.__columns = [array.array('q')]
+
+    for col in range(1, len(header) + 1):
+      if col in list_indices:
+        self.__columns.append([])
+      elif col in int_indices:
+        self.__columns.append(array.array('q'))
+      elif col in float_indices:
+        self.__columns.append(array.array('d'))
+      else:
+        self.__columns.append([])
+
+  def __len__(self):
+    return len(self.__columns[0]) + 1
+
+  def __getitem__(self, row):
+    if row < 0:
+      row += len(self)
+
+    if row == 0:
+      return self.__header
+
+    elif row < 0:
+      raise IndexError('list index out of range')
+
+    return [c[row - 1] for c in self.__columns]
+
+  def append(self, fields):
+    for col, v in enumerate(fields):
+      c = self.__columns[col]
+
+      if isinstance(c, array.array):
+        if type(v) is (int if c.typecode == 'q' else float):
+          try:
+            c.append(v)
+            continue
+
+          except OverflowError:
+            pass
+
+        c = self.__columns[col] = list(c)
+
+      c.append(sys.intern(v) if type(v) is str else v)
+
+  def index(self, field):
+    if field in self.__index:
+      return self.__index[field]
+
+    raise ValueError(f'{field!r} is not in list')
+
+  def column(self, col):
+    return self.__columns[col]
+
+  def sort_key(self, col, key=None, reverse=False):
+    c = self.__columns[col]
+    values = c
+
+    if key:
+      values = []
+      cache = {}
+
+      for v in c:
+        try:
+          if v not in cache:
+            cache[v] = key(v)
+          values.append(cache[v])
 
+        except TypeError:
+          values.append(key(v))
+
+    if reverse:
+      if key is None and isinstance(c, array.array):
+        return [-v for v in c]
+
+      try:
+        ranks = { v: -i for i, v in enumerate(sorted(set(values))) }
+        return [ranks[v] for v in values]
+
+      except TypeError:
+        ranks = [0] * len(values)
+        order = sorted(range(len(values)), key=values.__getitem__)
+
+        for i in range(1, len(order)):
+          ranks[order[i]] = ranks[order[i - 1]] - (values[order[i - 1]] < values[order[i]])
+
+        return ranks
+
+    return values
+
+  def sort(self, keys):
+    keys = list(zip(*keys))
+    order = sorted(range(len(keys)), key=keys.__getitem__)
+
+    for i, c in enumerate(self.__columns):
+      if isinstance(c, array.array):
+        self.__columns[i] = array.array(c.typecode, (c[r] for r in order))
+      else:
+        self.__columns[i] = [c[r] for r in order]
+
+
+class _TemplateLoader(jinja2.BaseLoader):
+  def __init__(self, templates):
+    self.__templates = {}
+
+    for f, v in templates.items():
+      self.__templates[os.path.normpath(f).strip('./')] = v
+
+  def get_source(self, environment, template):
+    name = '/'.join(jinja2.loaders.split_template_path(template))
+
+    if name not in self.__templates:
+      raise jinja2.TemplateNotFound(template, f'{template!r} not found in search path')
+
+    return self.__templates[name], name, lambda: True
+
+  def list_templates(self):
+    return sorted(self.__templates)
+
+
+class _BytecodeCache(jinja2.FileSystemBytecodeCache):
+  def __init__(self, directory, prefix, max_bytes):
+    super().__init__(directory, '__jinjafx_' + prefix + '_%s.cache')
+    self.__max_bytes = max_bytes
+    self.__used = self.__prune()
+
+  def get_bucket(self, environment, name, filename, source):
+    return super().get_bucket(environment, name, self.get_source_checksum(source), source)
+
+  def load_bytecode(self, bucket):
+    super().load_bytecode(bucket)
+
+    if bucket.code is not None:
+      try:
+        os.utime(self._get_cache_filename(bucket))
+
+      except OSError:
+        pass
+
+  def dump_bytecode(self, bucket):
+    super().dump_bytecode(bucket)
+
+    try:
+      self.__used += os.path.getsize(self._get_cache_filename(bucket))
+
+    except OSError:
+      pass
+
+    if self.__used > self.__max_bytes:
+      self.__used = self.__prune()
+
+  def __prune(self):
+    files = []
+    used = 0
+
+    with os.scandir(self.directory) as it:
+      for e in it:
+        if e.name.startswith('__jinjafx_') and e.name.endswith('.cache') and e.is_file():
+          st = e.stat()
+          files.append((st.st_mtime, st.st_size, e.path))
+          used += st.st_size
+
+    for mtime, size, f in sorted(files):
+      if used <= self.__max_bytes:
+        break
+
+      try:
+        os.remove(f)
+        used -= size
+
+      except OSError:
+        pass
+
+    return used
+
+
+def _jinjafx_worker_init(*args):
+  global _jinjafx_worker
+  _jinjafx_worker = JinjaFx()
+  _jinjafx_worker._worker_init(*args)
+
+
+def _jinjafx_worker_render(start, stop):
+  try:
+    return _jinjafx_worker._worker_render(start, stop)
+
+  except Exception:
+    return None
+
+
+class JinjaFx():
+  def _jinjafx(self, template, data, gvars, output, exts_dirs=None, sandbox=False, use_oformat=False, engine=None, workers=None):
+    groups = { (0, '_stderr_'): [] }
     outputs = {}
+
+    for oname, index, lines in self._jinjafx_iter(template, data, gvars, output, exts_dirs, sandbox, use_oformat, engine, workers):
+      groups.setdefault((index, oname), []).extend(lines)
+
+    for index, oname in sorted(groups.keys(), key=lambda x: x[0]):
+      outputs.setdefault(oname, []).extend(groups[(index, oname)])
+
+    return {k: v for k, v in outputs.items() if (k == '_stderr_') or len(''.join(v).strip())}
+
+
+  def _jinjafx_iter(self, template, data, gvars, output, exts_dirs=None, sandbox=False, use_oformat=False, engine=None, workers=None):
+    close_engine = engine is None
+    if close_engine:
+      engine = JinjaFx.Engine(exts_dirs, sandbox)
+
+    sandbox = engine.sandbox
+    self.__reset(sandbox)
+
     delim = None
     rowkey = 1
     int_indices = []
     float_indices = []
     list_indices = []
-    tempdir = None
 
     if not isinstance(template, (str, io.TextIOWrapper, dict)):
       raise TypeError('template must be of type str, dict or type FileType')
@@ -582,17 +1195,22 @@ class JinjaFx():
         jinjafx_adjust_headers = str(gvars.get('jinjafx_adjust_headers', 'no')).strip().lower()
         recm = re.compile(r'(?<!\\){[ \t]*([0-9]+):([0-9]+)(:[0-9]+)?[ \t]*(?<!\\)}')
         rotm = re.compile(r'(?<!\\){[ \t]*((?:[0-9]+\|)+[0-9]+)(:[0-9]+)?[ \t]*(?<!\\)}')
+        rplain = re.compile(r'[\\\(\[{%]')
 
         for l in data.splitlines():
-          if l.strip() and not re.match(r'^[ \t]*#', l):
+          if l.strip() and not l.lstrip(' \t').startswith('#'):
             if not self.__g_datarows:
               if l.count(',') > l.count('\t'):
                 delim = r'[ \t]*(?<!\\),[ \t]*'
+                sdelim = ','
                 schars = ' \t'
               else:
                 delim = r' *\t *'
+                sdelim = '\t'
                 schars = ' '
 
+              rdelim = re.compile(delim)
+
               hfields = re.split(delim, re.sub('(?:' + delim + ')+$', '', l.strip(schars)))
               hfields = [re.sub(r'^(["\'])(.*)\1$', r'\2', f) for f in hfields]
 
@@ -618,395 +1236,671 @@ class JinjaFx():
                 elif jinjafx_adjust_headers != 'no':
                   raise Exception('invalid value specified for \'jinjafx_adjust_headers\' - must be \'yes\', \'no\', \'upper\' or \'lower\'')
 
-                if hfields[i] == '':
-                  raise Exception(f'empty header field detected at column position {i + 1}')
+                if hfields[i] == '':
+                  raise Exception(f'empty header field detected at column position {i + 1}')
+
+                elif not re.match(r'^[A-Z_][A-Z0-9_]*$', hfields[i], re.IGNORECASE):
+                  raise Exception(f'header field at column position {i + 1} contains invalid characters')
+
+              if len(set(hfields)) != len(hfields):
+                raise Exception('duplicate header field detected in data')
+
+              else:
+                self.__g_datarows = _DataTable(hfields, int_indices, float_indices, list_indices)
+
+              if 'jinjafx_filter' in gvars and gvars['jinjafx_filter']:
+                for field in gvars['jinjafx_filter']:
+                  jinjafx_filter[self.__g_datarows[0].index(field) + 1] = gvars['jinjafx_filter'][field]
+
+            elif not rplain.search(l):
+              n = len(self.__g_datarows[0])
+              ufields = [f.strip(schars) for f in l.strip(schars).split(sdelim)]
+              ufields = [f[1:-1] if len(f) > 1 and f[0] in ('"', "'") and f[-1] == f[0] else f for f in ufields[:n]]
+              fields = [rowkey] + ufields + [''] * (n - len(ufields))
+              rowkey += 1
+
+              if self.__jfx_data_row(fields, list_indices, int_indices, float_indices, jinjafx_filter):
+                self.__g_datarows.append(fields)
+
+            else:
+              gcount = 1
+              ufields = []
+
+              for f in rdelim.split(l.strip(schars)):
+                delta = 0
+
+                for m in re.finditer(r'(?<!\\)\((.+?)(?<!\\)\)', f):
+                  if not re.search(r'(?<!\\)\|', m.group(1)):
+                    if not re.search(r'\\' + str(gcount), l):
+                      if re.search(r'\\[0-9]+', l):
+                        raise Exception(f'parenthesis in row {rowkey} at "{m.group(0)}" should be escaped or removed')
+
+                      else:
+                        f = f[:m.start() + delta] + '\\(' + m.group(1) + '\\)' + f[m.end() + delta:]
+                        delta += 2
+
+                  gcount += 1
+
+                ufields.append(re.sub(r'^(["\'])(.*)\1$', r'\2', f))
+
+              n = len(self.__g_datarows[0])
+              columns = [list(zip(*self.__jfx_expand(f, True))) for f in ufields[:n] + [''] * (n - len(ufields))]
+              orow = rowkey
+              rowkey += 1
+
+              for row, xfields in enumerate(itertools.product(*columns)):
+                fields = [orow]
+                xgroups = []
+
+                for col, (v, g) in enumerate(xfields, 1):
+                  v = recm.sub(lambda m: self.__jfx_data_counter(m, orow, col, row), v)
+                  v = rotm.sub(lambda m: self.__jfx_data_loop(m, orow, col, row), v)
+
+                  for i in range(len(g)):
+                    g[i] = recm.sub(lambda m: self.__jfx_data_counter(m, orow, col, row), g[i])
+                    g[i] = rotm.sub(lambda m: self.__jfx_data_loop(m, orow, col, row), g[i])
+
+                  fields.append(v)
+                  xgroups.append(g)
+
+                groups = dict(enumerate(sum(xgroups, ['\\0'])))
+
+                for col in range(1, len(fields)):
+                  fields[col] = re.sub(r'\\([0-9]+)', lambda m: groups.get(int(m.group(1)), '\\' + str(m.group(1))), fields[col])
+                  fields[col] = re.sub(r'([0-9]+)(?<!\\)\%([0-9]+)', lambda m: str(int(m.group(1))).zfill(int(m.group(2))), fields[col])
+                  fields[col] = re.sub(r'\\([}{%,])', r'\1', fields[col])
+
+                if self.__jfx_data_row(fields, list_indices, int_indices, float_indices, jinjafx_filter):
+                  self.__g_datarows.append(fields)
+
+        if len(self.__g_datarows) <= 1:
+          raise Exception('not enough data rows - need at least two')
+
+    if 'jinjafx_schema' in gvars and gvars['jinjafx_schema']:
+      group_vars = { k: v for k, v in gvars.items() if not k.startswith(('jinjafx_', 'jinja2_'))}
+      jsonschema.validate(instance=json.loads(json.dumps(group_vars)), schema=gvars['jinjafx_schema'])
+
+    if 'jinjafx_sort' in gvars and gvars['jinjafx_sort'] and self.__g_datarows:
+      keys = []
+
+      for field in reversed(gvars['jinjafx_sort']):
+        if isinstance(field, dict):
+          fn = next(iter(field))
+          r = True if fn.startswith('-') else False
+          mv = []
+
+          for rx, v in field[fn].items():
+            mv.append([re.compile(rx + '$'), v])
+
+          keys.insert(0, self.__g_datarows.sort_key(self.__g_datarows.index(fn.lstrip('+-')) + 1, key=lambda n: (self.__find_re_match(mv, n), n), reverse=r))
+
+        else:
+          r = True if field.startswith('-') else False
+          keys.insert(0, self.__g_datarows.sort_key(self.__g_datarows.index(field.lstrip('+-')) + 1, reverse=r))
+
+      self.__g_datarows.sort(keys)
+
+    if (len(self.__g_datarows) > 1) and ('inventory_hostname' in self.__g_datarows[0]):
+      idx = self.__g_datarows[0].index('inventory_hostname') + 1
+      groups = { 'all': [] }
+
+      for r in range(1, len(self.__g_datarows)):
+        row = self.__g_datarows[r]
+        hvp = self.__g_hostvars[row[idx]] = { 'groups': groups }
+        groups['all'].append(row[idx])
+
+        for c in range(len(self.__g_datarows[0])):
+          hvp.update({ self.__g_datarows[0][c]: row[c + 1] })
+
+          if self.__g_datarows[0][c] == 'group_names':
+            if isinstance(row[c + 1], list):
+              for g in row[c + 1]:
+                groups.setdefault(g, []).append(row[idx])
+
+            else:
+              groups.setdefault(hvp['group_names'], []).append(row[idx])
+              hvp['group_names'] = [hvp['group_names']]
+
+        if 'group_names' not in hvp:
+          hvp.update({ 'group_names': [] })
+
+    gvars = dict(gvars)
+    gvars['jinja2_extensions'] = engine._plugins() + list(gvars.get('jinja2_extensions', [ 'jinja2.ext.do', 'jinja2.ext.loopcontrols' ]))
+    jinja2_options = engine._options()
+
+    if 'jinja2_options' in gvars and gvars['jinja2_options']:
+      for o in ('trim_blocks', 'lstrip_blocks', 'keep_trailing_newline'):
+        if o in gvars['jinja2_options']:
+          jinja2_options[o] = gvars['jinja2_options'][o]
+
+    template_name = 'Default'
+
+    if isinstance(template, str):
+      template = { 'template.j2': template }
+      template_name = 'template.j2'
+
+    try:
+      env, rtemplate = engine._template(template, template_name, gvars['jinja2_extensions'], jinja2_options)
+
+      if gvars:
+        jinjafx_disable_dataloop = gvars.get('jinjafx_disable_dataloop', False)
+        gvars = self.__render_vars(env, engine, jinja2_options, gvars)
+
+      else:
+        jinjafx_disable_dataloop = False
+
+      self.__set_globals(env)
+
+      routput = engine._from_string(gvars['jinja2_extensions'], jinja2_options, output)
+      chunks = iter(())
+      blanks = {}
+      seen = set()
+      row = 1
+      nwarnings = 0
+
+      if workers is not None and workers > 1 and not sandbox and not jinjafx_disable_dataloop and len(self.__g_datarows) > 2:
+        if not any(re.search(r'\b(?:counter|setg|getg)\b', v) for v in [output, env.loader.get_source(env, rtemplate.name)[0]]):
+          chunks = self.__render_parallel(workers, template, template_name, gvars['jinja2_extensions'], jinja2_options, engine._exts_dirs(), gvars, output, use_oformat)
+
+      while row < max(2, len(self.__g_datarows)):
+        if (chunk := next(chunks, None)) is not None:
+          row, (routputs, rblanks) = chunk
+
+        else:
+          routputs, rblanks = self.__render_rows(env, rtemplate, routput, gvars, range(row, row + 1), use_oformat, jinjafx_disable_dataloop)
+          row += 1
+
+        for o, lines in routputs.items():
+          if o != '0:_stderr_':
+            seen.add(o)
+            index, oname = o.split(':', 1)
+            yield oname, int(index), lines
+
+        blanks.update(rblanks)
+
+        if len(self.__g_warnings) > nwarnings:
+          yield '_stderr_', 0, self.__g_warnings[nwarnings:]
+          nwarnings = len(self.__g_warnings)
+
+        if jinjafx_disable_dataloop:
+          break
+
+      for o in blanks:
+        if o in seen:
+          index, oname = o.split(':', 1)
+          yield oname, int(index), [' ']
+
+    finally:
+      if close_engine:
+        engine.close()
+
+
+  def __reset(self, sandbox):
+    self.__g_datarows = []
+    self.__g_dict = {}
+    self.__g_row = 0
+    self.__g_vars = {}
+    self.__g_rvars = None
+    self.__g_filters = {}
+    self.__g_hostvars = {}
+    self.__g_fandl = {}
+    self.__g_fields = {}
+    self.__g_warnings = []
+    self.__g_wlog = None
+    self.__g_stateful = False
+    self.__g_xlimit = 5000 if sandbox else 0
+    self.__g_hcounter = re.compile(r'(?:[A-Z]\.)+$', re.IGNORECASE)
+
+
+  def __set_globals(self, env):
+    env.globals.update({ 'jinjafx': {
+      'version': __version__,
+      'jinja2_version': importlib.metadata.version('jinja2'),
+      'eval': self.__jfx_eval,
+      'expand': self.__jfx_expand,
+      'counter': self.__jfx_counter,
+      'exception': self.__jfx_exception,
+      'warning': self.__jfx_warning,
+      'first': self.__jfx_first,
+      'last': self.__jfx_last,
+      'fields': self.__jfx_fields,
+      'tabulate': self.__jfx_tabulate,
+      'data': self.__jfx_data,
+      'setg': self.__jfx_setg,
+      'getg': self.__jfx_getg,
+      'now': self.__jfx_now,
+      'rows': max([0, len(self.__g_datarows) - 1]),
+    },
+      'lookup': self.__jfx_lookup,
+      'vars': self.__jfx_lookup_vars,
+      'varnames': self.__jfx_lookup_varnames
+    })
+
+    if self.__g_hostvars:
+      env.globals.update({ 'hostvars': self.__g_hostvars })
+
+    self.__g_filters = env.filters
+
+
+  def __render_vars(self, env, engine, options, gvars):
+    leaves = []
+
+    if self.__find_vars(gvars, (), leaves, set()):
+      if not leaves:
+        return gvars
+
+      source = yaml.dump([{ 'v': s } if p is dict else [s] for path, p, s in leaves], Dumper=_yaml_dumper, sort_keys=False)
+      values = yaml.load(engine._from_string(gvars['jinja2_extensions'], options, source).render(gvars), Loader=_yaml_loader)
+
+      if isinstance(values, list) and len(values) == len(leaves) and all(type(v) is p and len(v) == 1 and (p is list or 'v' in v) for v, (path, p, s) in zip(values, leaves)):
+        rvars = dict(gvars)
+        copies = { (): rvars }
+
+        for (path, p, s), v in zip(leaves, values):
+          c = rvars
+
+          for i in range(1, len(path)):
+            if (n := copies.get(path[:i])) is None:
+              n = copies[path[:i]] = copy.copy(c[path[i - 1]])
+              c[path[i - 1]] = n
+
+            c = n
+
+          c[path[-1]] = v[0] if p is list else v['v']
+
+        return rvars
+
+    return yaml.load(env.from_string(yaml.dump(gvars, Dumper=_yaml_dumper, sort_keys=False)).render(gvars), Loader=_yaml_loader)
+
+
+  def __find_vars(self, value, path, leaves, seen):
+    if id(value) in seen:
+      return False
+
+    seen.add(id(value))
+
+    for k, v in value.items() if type(value) is dict else enumerate(value):
+      if type(value) is dict and (type(k) not in (str, int, float, bool, type(None)) or (type(k) is str and ('{{' in k or '{%' in k or '{#' in k))):
+        return False
 
-                elif not re.match(r'^[A-Z_][A-Z0-9_]*$', hfields[i], re.IGNORECASE):
-                  raise Exception(f'header field at column position {i + 1} contains invalid characters')
+      if type(v) is str:
+        if '{%' in v or '{#' in v:
+          return False
 
-              if len(set(hfields)) != len(hfields):
-                raise Exception('duplicate header field detected in data')
+        if '{{' in v:
+          leaves.append((path + (k,), type(value), v))
 
-              else:
-                self.__g_datarows.append(hfields)
+      elif type(v) in (dict, list):
+        if not self.__find_vars(v, path + (k,), leaves, seen):
+          return False
 
-              if 'jinjafx_filter' in gvars and gvars['jinjafx_filter']:
-                for field in gvars['jinjafx_filter']:
-                  jinjafx_filter[self.__g_datarows[0].index(field) + 1] = gvars['jinjafx_filter'][field]
+      elif type(v) not in (int, float, bool, type(None), bytes, datetime.date) and not (type(v) is datetime.datetime and v.tzinfo is None):
+        return False
 
-            else:
-              gcount = 1
-              ufields = []
+    return True
 
-              for f in re.split(delim, l.strip(schars)):
-                delta = 0
 
-                for m in re.finditer(r'(?<!\\)\((.+?)(?<!\\)\)', f):
-                  if not re.search(r'(?<!\\)\|', m.group(1)):
-                    if not re.search(r'\\' + str(gcount), l):
-                      if re.search(r'\\[0-9]+', l):
-                        raise Exception(f'parenthesis in row {rowkey} at "{m.group(0)}" should be escaped or removed')
+  def __render_rows(self, env, rtemplate, routput, gvars, rows, use_oformat, jinjafx_disable_dataloop):
+    outputs = {}
+    blanks = {}
 
-                      else:
-                        f = f[:m.start() + delta] + '\\(' + m.group(1) + '\\)' + f[m.end() + delta:]
-                        delta += 2
+    for row in rows:
+      rowdata = {}
 
-                  gcount += 1
+      if self.__g_datarows and not jinjafx_disable_dataloop:
+        rowdata.update(zip(self.__g_datarows[0], self.__g_datarows[row][1:]))
 
-                ufields.append(re.sub(r'^(["\'])(.*)\1$', r'\2', f))
+        env.globals['jinjafx'].update({ 'row': row })
+        self.__g_row = row
 
-              n = len(self.__g_datarows[0])
-              fields = [list(map(self.__jfx_expand, ufields[:n] + [''] * (n - len(ufields)), [True] * n))]
+      else:
+        env.globals['jinjafx'].update({ 'row': 0 })
+        self.__g_row = 0
 
-              row = 0
-              while fields:
-                if not isinstance(fields[0][0], int):
-                  fields[0].insert(0, rowkey)
-                  rowkey += 1
+      if self.__g_rvars is None:
+        self.__g_rvars = env.track(gvars)
 
-                if any(isinstance(colx[0], list) for colx in fields[0][1:]):
-                  for col in range(1, len(fields[0])):
-                    if isinstance(fields[0][col][0], list):
-                      for i, v in enumerate(fields[0][col][0]):
-                        nrow = [e[:] if isinstance(e, list) else e for e in fields[0]]
-                        nrow[col] = [v, fields[0][col][1][i]]
-                        fields.append(nrow)
+      else:
+        env.restore()
 
-                      fields.pop(0)
-                      break
+      self.__g_vars = dict(self.__g_rvars)
+      self.__g_vars.update(rowdata)
 
-                else:
-                  xgroups = []
+      try:
+        content = rtemplate.render(self.__g_vars)
 
-                  for col in range(1, len(fields[0])):
-                    fields[0][col][0] = recm.sub(lambda m: self.__jfx_data_counter(m, fields[0][0], col, row), fields[0][col][0])
-                    fields[0][col][0] = rotm.sub(lambda m: self.__jfx_data_loop(m, fields[0][0], col, row), fields[0][col][0])
+        outputs['0:_stderr_'] = []
+        if self.__g_warnings:
+          outputs['0:_stderr_'] = self.__g_warnings
 
-                    for g in range(len(fields[0][col][1])):
-                      fields[0][col][1][g] = recm.sub(lambda m: self.__jfx_data_counter(m, fields[0][0], col, row), fields[0][col][1][g])
-                      fields[0][col][1][g] = rotm.sub(lambda m: self.__jfx_data_loop(m, fields[0][0], col, row), fields[0][col][1][g])
+      except MemoryError:
+        raise MemoryError('not enough memory to process template')
 
-                    xgroups.append(fields[0][col][1])
+      except JinjaFx.TemplateException:
+        raise
 
-                  groups = dict(enumerate(sum(xgroups, ['\\0'])))
+      except Exception as e:
+        if len(e.args) >= 1 and self.__g_row:
+          e.args = (e.args[0] + ' at data row ' + str(self.__g_datarows[row][0]) + ':\n - ' + str(rowdata),) + e.args[1:]
+        raise
 
-                  for col in range(1, len(fields[0])):
-                    fields[0][col] = re.sub(r'\\([0-9]+)', lambda m: groups.get(int(m.group(1)), '\\' + str(m.group(1))), fields[0][col][0])
+      stack = ['0:' + routput.render(rowdata)]
+      output_tag = _output_tags[bool(use_oformat)]
 
-                    delta = 0
-                    for m in re.finditer(r'([0-9]+)(?<!\\)\%([0-9]+)', fields[0][col]):
-                      pvalue = str(int(m.group(1))).zfill(int(m.group(2)))
-                      fields[0][col] = fields[0][col][:m.start() + delta] + pvalue + fields[0][col][m.end() + delta:]
+      for l in content.splitlines():
+        pos = 0
 
-                      if len(m.group(0)) > len(pvalue):
-                        delta -= len(m.group(0)) - len(pvalue)
-                      else:
-                        delta += len(pvalue) - len(m.group(0))
+        if '<' in l:
+          for tag in output_tag.finditer(l):
+            if l[pos:tag.start()].strip():
+              outputs.setdefault(stack[-1], []).append(l[pos:tag.start()])
 
-                    fields[0][col] = re.sub(r'\\([}{%,])', r'\1', fields[0][col])
+            pos = tag.end()
 
-                    if col in list_indices:
-                      fields[0][col] = re.split(r'[ \t]*;[ \t]*', fields[0][col])
+            if tag.group(2) is not None:
+              oname = tag.group(2)
+              if oname.startswith(('"', "'")) or oname.endswith(('"', "'")):
+                if (len(oname.replace(' ', '')) > 2) and (oname[0] == oname[-1]) and not (oname[0] in oname[1:-1]):
+                  oname = oname[1:-1].strip()
 
-                      if col in int_indices:
-                        fields[0][col] = list(map(int, fields[0][col]))
+                else:
+                  raise Exception('invalid output tag')
 
-                      elif col in float_indices:
-                        fields[0][col] = list(map(float, fields[0][col]))
+              elif len(oname.strip()) == 0:
+                raise Exception('invalid output tag')
 
-                    elif col in int_indices:
-                      fields[0][col] = int(fields[0][col])
+              if tag.group(3) is not None:
+                index = int(tag.group(3))
+              else:
+                index = 0
 
-                    elif col in float_indices:
-                      fields[0][col] = float(fields[0][col])
+              oformat = tag.group(1) if tag.group(1) else (':text' if use_oformat else '')
+              stack.append(str(index) + ':' + oname.strip() + oformat.lower())
 
-                  include_row = True
-                  if jinjafx_filter:
-                    for index in jinjafx_filter:
-                      if isinstance(fields[0][index], list):
-                        field_match = False
-                        for v in fields[0][index]:
-                          if re.search(jinjafx_filter[index], v):
-                            field_match = True
-                            break
+            else:
+              if tag.group(4):
+                blanks[stack[-1]] = True
 
-                        if not field_match:
-                          include_row = False
+              if len(stack) > 1:
+                stack.pop()
+              else:
+                raise Exception('unbalanced output tags')
 
-                      else:
-                        if not re.search(jinjafx_filter[index], fields[0][index]):
-                          include_row = False
+        if pos == 0 or l[pos:].strip():
+          outputs.setdefault(stack[-1], []).append(l[pos:])
 
-                      if not include_row:
-                        break
+      if len(stack) != 1:
+        raise Exception('unbalanced output tags')
 
-                  if include_row:
-                    self.__g_datarows.append(fields[0])
+      if jinjafx_disable_dataloop:
+        break
 
-                  fields.pop(0)
-                  row += 1
+    return outputs, blanks
 
-        if len(self.__g_datarows) <= 1:
-          raise Exception('not enough data rows - need at least two')
 
-    if 'jinjafx_schema' in gvars and gvars['jinjafx_schema']:
-      group_vars = { k: v for k, v in gvars.items() if not k.startswith(('jinjafx_', 'jinja2_'))}
-      jsonschema.validate(instance=json.loads(json.dumps(group_vars)), schema=gvars['jinjafx_schema'])
+  def __render_parallel(self, workers, template, template_name, extensions, options, exts_dirs, gvars, output, use_oformat):
+    nrows = len(self.__g_datarows) - 1
+    chunk = -(-nrows // (workers * 4))
+    starts = range(1, nrows + 1, chunk)
 
-    if 'jinjafx_sort' in gvars and gvars['jinjafx_sort']:
-      for field in reversed(gvars['jinjafx_sort']):
-        if isinstance(field, dict):
-          fn = next(iter(field))
-          r = True if fn.startswith('-') else False
-          mv = []
+    if not isinstance(template, dict):
+      template = template.name
 
-          for rx, v in field[fn].items():
-            mv.append([re.compile(rx + '$'), v])
+    initargs = (template, template_name, extensions, options, exts_dirs, gvars, self.__g_datarows, self.__g_hostvars, output, use_oformat)
 
-          self.__g_datarows[1:] = sorted(self.__g_datarows[1:], key=lambda n: (self.__find_re_match(mv, n[self.__g_datarows[0].index(fn.lstrip('+-')) + 1]), n[self.__g_datarows[0].index(fn.lstrip('+-')) + 1]), reverse=r)
+    stops = [min(x + chunk, nrows + 1) for x in starts]
+    executor = concurrent.futures.ProcessPoolExecutor(workers, initializer=_jinjafx_worker_init, initargs=initargs)
 
-        else:
-          r = True if field.startswith('-') else False
-          self.__g_datarows[1:] = sorted(self.__g_datarows[1:], key=lambda n: n[self.__g_datarows[0].index(field.lstrip('+-')) + 1], reverse=r)
+    try:
+      for stop, result in zip(stops, executor.map(_jinjafx_worker_render, starts, stops)):
+        if result is None:
+          return
 
-    if (len(self.__g_datarows) > 1) and ('inventory_hostname' in self.__g_datarows[0]):
-      idx = self.__g_datarows[0].index('inventory_hostname') + 1
-      groups = { 'all': [] }
+        routputs, rblanks, wlog, stateful = result
 
-      for r in range(1, len(self.__g_datarows)):
-        hvp = self.__g_hostvars[self.__g_datarows[r][idx]] = { 'groups': groups }
-        groups['all'].append(self.__g_datarows[r][idx])
+        if stateful:
+          return
 
-        for c in range(len(self.__g_datarows[0])):
-          hvp.update({ self.__g_datarows[0][c]: self.__g_datarows[r][c + 1] })
+        for message, repeat in wlog:
+          self.__jfx_warning(message, repeat)
 
-          if self.__g_datarows[0][c] == 'group_names':
-            if isinstance(self.__g_datarows[r][c + 1], list):
-              for g in self.__g_datarows[r][c + 1]:
-                groups.setdefault(g, []).append(self.__g_datarows[r][idx])
+        yield stop, (routputs, rblanks)
 
-            else:
-              groups.setdefault(hvp['group_names'], []).append(self.__g_datarows[r][idx])
-              hvp['group_names'] = [hvp['group_names']]
+    finally:
+      executor.shutdown(wait=False, cancel_futures=True)
 
-        if 'group_names' not in hvp:
-          hvp.update({ 'group_names': [] })
 
-    if exts_dirs is not None:
-      sys.path += [os.path.abspath(os.path.dirname(__file__)) + '/extensions'] + exts_dirs
+  def _worker_init(self, template, template_name, extensions, options, exts_dirs, gvars, datarows, hostvars, output, use_oformat):
+    self.__reset(False)
+    self.__g_datarows = datarows
+    self.__g_hostvars = hostvars
+    self.__g_engine = JinjaFx.Engine(exts_dirs)
+
+    if isinstance(template, dict):
+      env, rtemplate = self.__g_engine._template(template, template_name, extensions, options)
+
     else:
-      sys.path += [os.path.abspath(os.path.dirname(__file__)) + '/extensions']
+      with open(template, 'rt') as f:
+        env, rtemplate = self.__g_engine._template(f, template_name, extensions, options)
 
-    if 'jinja2_extensions' not in gvars:
-      gvars.update({ 'jinja2_extensions': [ 'jinja2.ext.do', 'jinja2.ext.loopcontrols' ] })
+    self.__set_globals(env)
+    self.__g_worker = (env, rtemplate, self.__g_engine._from_string(extensions, options, output), gvars, use_oformat)
 
-    if importlib.util.find_spec('ext_jinjafx') is not None:
-      gvars['jinja2_extensions'].insert(0, 'ext_jinjafx.plugin')
 
-    if importlib.util.find_spec('ext_ansible_netcommon') is not None:
-      gvars['jinja2_extensions'].insert(0, 'ext_ansible_netcommon.plugin')
+  def _worker_render(self, start, stop):
+    env, rtemplate, routput, gvars, use_oformat = self.__g_worker
+    self.__g_warnings = []
+    self.__g_wlog = []
+
+    outputs, blanks = self.__render_rows(env, rtemplate, routput, gvars, range(start, stop), use_oformat, False)
+    return outputs, blanks, self.__g_wlog, self.__g_stateful
+
+
+  class Engine():
+    def __init__(self, exts_dirs=None, sandbox=False, jinja2_options=None, cache_size=128, cache_source_bytes=64 * 1024 * 1024, bytecode_cache=None, bytecode_cache_bytes=256 * 1024 * 1024):
+      self.__sandbox = sandbox
+      self.__exts_dirs = list(exts_dirs or [])
+      self.__bytecode_cache = bytecode_cache
+      self.__bytecode_cache_bytes = bytecode_cache_bytes
+      self.__environments = collections.OrderedDict()
+      self.__loaders = collections.OrderedDict()
+      self.__lock = threading.Lock()
+      self.__streaming = False
+      self.__plugins = []
+      self.__cache = collections.OrderedDict()
+      self.__cache_size = cache_size
+      self.__cache_source_bytes = cache_source_bytes
+      self.__cache_used = 0
+      self.__cache_hits = 0
+      self.__cache_misses = 0
+
+      self.__jinja2_options = {
+        'undefined': jinja2.StrictUndefined,
+        'trim_blocks': True,
+        'lstrip_blocks': True,
+        'keep_trailing_newline': True
+      }
+
+      if jinja2_options:
+        self.__jinja2_options.update(jinja2_options)
+
+      _extension_finder.add_paths([os.path.abspath(os.path.dirname(__file__)) + '/extensions'] + (exts_dirs or []))
+
+      if _extension_finder not in sys.meta_path:
+        sys.meta_path.append(_extension_finder)
+
+      for ext in ('ext_ansible_core', 'ext_ansible_netcommon', 'ext_jinjafx'):
+        if importlib.util.find_spec(ext) is not None:
+          self.__plugins.append(ext + '.plugin')
+
+    def __enter__(self):
+      return self
+
+    def __exit__(self, *args):
+      self.close()
+
+    @property
+    def sandbox(self):
+      return self.__sandbox
+
+    @property
+    def cache_hits(self):
+      return self.__cache_hits
+
+    @property
+    def cache_misses(self):
+      return self.__cache_misses
+
+    def render(self, template, data=None, gvars=None, output='_stdout_', use_oformat=False, workers=None):
+      with self.__lock:
+        self.__check_streaming()
+        return JinjaFx()._jinjafx(template, data, gvars or {}, output, use_oformat=use_oformat, engine=self, workers=workers)
+
+    def stream(self, template, data=None, gvars=None, output='_stdout_', use_oformat=False, workers=None):
+      with self.__lock:
+        self.__check_streaming()
+        self.__streaming = True
 
-    if importlib.util.find_spec('ext_ansible_core') is not None:
-      gvars['jinja2_extensions'].insert(0, 'ext_ansible_core.plugin')
+      try:
+        yield from JinjaFx()._jinjafx_iter(template, data, gvars or {}, output, use_oformat=use_oformat, engine=self, workers=workers)
 
-    jinja2_options = {
-      'undefined': jinja2.StrictUndefined,
-      'trim_blocks': True,
-      'lstrip_blocks': True,
-      'keep_trailing_newline': True
-    }
+      finally:
+        self.__streaming = False
 
-    if 'jinja2_options' in gvars and gvars['jinja2_options']:
-      for o in ('trim_blocks', 'lstrip_blocks', 'keep_trailing_newline'):
-        if o in gvars['jinja2_options']:
-          jinja2_options[o] = gvars['jinja2_options'][o]
+    def close(self):
+      with self.__lock:
+        self.__check_streaming()
 
-    jinja2env = jinja2.sandbox.SandboxedEnvironment if sandbox else jinja2.Environment
-    template_name = 'Default'
+        while self.__cache:
+          self.__cache_evict()
 
-    if isinstance(template, str):
-      template = { 'template.j2': template }
-      template_name = 'template.j2'
+        self.__environments.clear()
+        self.__loaders.clear()
 
-    try:
-      if isinstance(template, dict):
-        tempdir = tempfile.mkdtemp(prefix='jinjafx_')
+    def _plugins(self):
+      return list(self.__plugins)
 
-        for f, v in template.items():
-          f = tempdir + '/' + os.path.normpath(f).strip('./')
-          os.makedirs(os.path.dirname(f), exist_ok=True)
+    def _exts_dirs(self):
+      return list(self.__exts_dirs)
 
-          with open(f, 'wt') as fh:
-            fh.write(v)
+    def _options(self):
+      return dict(self.__jinja2_options)
 
-        template = open(tempdir + '/' + template_name, 'rt')
+    def _environment(self, extensions, options, loader):
+      key = (tuple(extensions), tuple(sorted(options.items())))
 
-      env = jinja2env(extensions=gvars['jinja2_extensions'], loader=jinja2.FileSystemLoader(os.path.dirname(template.name)), **jinja2_options)
-      rtemplate = env.get_template(os.path.basename(template.name))
+      if (env := self.__environments.get(key)) is None:
+        jinja2env = _SandboxedEnvironment if self.__sandbox else _Environment
+        bcc = None
 
-      if gvars:
-        jinjafx_disable_dataloop = gvars.get('jinjafx_disable_dataloop', False)
-        gyaml = env.from_string(yaml.dump(gvars, sort_keys=False)).render(gvars)
-        gvars = yaml.load(gyaml, Loader=yaml.SafeLoader)
+        if self.__bytecode_cache is not None:
+          prefix = hashlib.sha256(repr((__version__, jinja2.__version__, self.__sandbox, key)).encode('utf-8')).hexdigest()[:16]
+          bcc = _BytecodeCache(self.__bytecode_cache, prefix, self.__bytecode_cache_bytes)
+
+        env = self.__environments[key] = jinja2env(extensions=extensions, bytecode_cache=bcc, **{ 'cache_size': self.__cache_size, **options })
+
+        while len(self.__environments) > max(self.__cache_size, 1):
+          self.__environment_evict()
 
       else:
-        jinjafx_disable_dataloop = False
+        self.__environments.move_to_end(key)
 
-      env.globals.update({ 'jinjafx': {
-        'version': __version__,
-        'jinja2_version': importlib.metadata.version('jinja2'),
-        'eval': self.__jfx_eval,
-        'expand': self.__jfx_expand,
-        'counter': self.__jfx_counter,
-        'exception': self.__jfx_exception,
-        'warning': self.__jfx_warning,
-        'first': self.__jfx_first,
-        'last': self.__jfx_last,
-        'fields': self.__jfx_fields,
-        'tabulate': self.__jfx_tabulate,
-        'data': self.__jfx_data,
-        'setg': self.__jfx_setg,
-        'getg': self.__jfx_getg,
-        'now': self.__jfx_now,
-        'rows': max([0, len(self.__g_datarows) - 1]),
-      },
-        'lookup': self.__jfx_lookup,
-        'vars': self.__jfx_lookup_vars,
-        'varnames': self.__jfx_lookup_varnames
-      })
-
-      if self.__g_hostvars:
-        env.globals.update({ 'hostvars': self.__g_hostvars })
-
-      self.__g_filters = env.filters
-
-      routput = env.from_string(output)
-      blanks = {}
+      env.loader = loader
+
+      for g in ('jinjafx', 'lookup', 'vars', 'varnames', 'hostvars'):
+        env.globals.pop(g, None)
+
+      return env
 
-      for row in range(1, max(2, len(self.__g_datarows))):
-        rowdata = {}
+    def _template(self, template, template_name, extensions, options):
+      while len(self.__cache) > self.__cache_size or self.__cache_used > self.__cache_source_bytes:
+        self.__cache_evict()
 
-        if self.__g_datarows and not jinjafx_disable_dataloop:
-          for col in range(len(self.__g_datarows[0])):
-            rowdata.update({ self.__g_datarows[0][col]: self.__g_datarows[row][col + 1] })
+      if not isinstance(template, dict):
+        searchpath = os.path.dirname(template.name)
 
-          env.globals['jinjafx'].update({ 'row': row })
-          self.__g_row = row
+        if (loader := self.__loaders.get(searchpath)) is None:
+          loader = self.__loaders[searchpath] = jinja2.FileSystemLoader(searchpath)
+
+          while len(self.__loaders) > max(self.__cache_size, 1):
+            evicted = self.__loaders.popitem(last=False)[1]
+
+            for env in self.__environments.values():
+              self.__purge(env, evicted)
 
         else:
-          env.globals['jinjafx'].update({ 'row': 0 })
-          self.__g_row = 0
+          self.__loaders.move_to_end(searchpath)
 
-        self.__g_vars = copy.deepcopy(gvars)
-        self.__g_vars.update(rowdata)
+        env = self._environment(extensions, options, loader)
+        return env, env.get_template(os.path.basename(template.name))
 
-        try:
-          content = rtemplate.render(self.__g_vars)
+      h = hashlib.sha256()
+      size = 0
 
-          outputs['0:_stderr_'] = []
-          if self.__g_warnings:
-            outputs['0:_stderr_'] = self.__g_warnings
+      for f in sorted(template):
+        for v in (f, template[f]):
+          b = v.encode('utf-8')
+          h.update(len(b).to_bytes(8, 'big') + b)
+          size += len(b)
 
-        except MemoryError:
-          raise MemoryError('not enough memory to process template')
+      key = ('template', tuple(extensions), tuple(sorted(options.items())), h.digest())
 
-        except JinjaFx.TemplateException:
-          raise
+      if (entry := self.__cache_get(key)) is not None:
+        return self._environment(extensions, options, entry['loader']), entry['template']
 
-        except Exception as e:
-          if len(e.args) >= 1 and self.__g_row:
-            e.args = (e.args[0] + ' at data row ' + str(self.__g_datarows[row][0]) + ':\n - ' + str(rowdata),) + e.args[1:]
-          raise
-
-        stack = ['0:' + routput.render(rowdata)]
-        start_tag = re.compile(r'<output(' + (r':\S+' if use_oformat else '') + r')?[\t ]+(.+?)[\t ]*>(?:\[(-?\d+)\])?', re.IGNORECASE)
-        end_tag = re.compile(r'</output[\t ]*(\\n[\t ]*)?>', re.IGNORECASE)
-        clines = content.splitlines()
-
-        i = 0
-        while i < len(clines):
-          l = clines[i]
-
-          block_begin = start_tag.search(l.strip())
-          if block_begin:
-            if block_begin.start() != 0:
-              clines[i] = l[:block_begin.start()]
-              clines.insert(i + 1, l[block_begin.start():])
-              continue
-
-            if block_begin.end() != len(l.strip()):
-              clines[i] = l[:block_begin.end()]
-              clines.insert(i + 1, l[block_begin.end():])
-              continue
-
-            oname = block_begin.group(2)
-            if oname.startswith(('"', "'")) or oname.endswith(('"', "'")):
-              if (len(oname.replace(' ', '')) > 2) and (oname[0] == oname[-1]) and not (oname[0] in oname[1:-1]):
-                oname = oname[1:-1].strip()
+      loader = _TemplateLoader(template)
+      env = self._environment(extensions, options, loader)
+      rtemplate = env.get_template(template_name)
 
-              else:
-                raise Exception('invalid output tag')
+      self.__cache_put(key, { 'template': rtemplate, 'loader': loader }, size)
+      return env, rtemplate
 
-            elif len(oname.strip()) == 0:
-              raise Exception('invalid output tag')
+    def _from_string(self, extensions, options, source):
+      key = ('string', tuple(extensions), tuple(sorted(options.items())), source)
 
-            if block_begin.group(3) is not None:
-              index = int(block_begin.group(3))
-            else:
-              index = 0
+      if (entry := self.__cache_get(key)) is None:
+        env = self.__environments[key[1:3]]
+        entry = self.__cache_put(key, { 'template': env.from_string(source) }, len(source.encode('utf-8')))
 
-            oformat = block_begin.group(1) if block_begin.group(1) else (':text' if use_oformat else '')
-            stack.append(str(index) + ':' + oname.strip() + oformat.lower())
+      return entry['template']
 
-          else:
-            block_end = end_tag.search(l.strip())
-            if block_end:
-              if block_end.start() != 0:
-                clines[i] = l[:block_end.start()]
-                clines.insert(i + 1, l[block_end.start():])
-                continue
-
-              if block_end.end() != len(l.strip()):
-                clines[i] = l[:block_end.end()]
-                clines.insert(i + 1, l[block_end.end():])
-                continue
-
-              if block_end.group(1):
-                blanks[stack[-1]] = True
+    def __check_streaming(self):
+      if self.__streaming:
+        raise RuntimeError('engine is busy with an unfinished stream()')
 
-              if len(stack) > 1:
-                stack.pop()
-              else:
-                raise Exception('unbalanced output tags')
-            else:
-              if stack[-1] not in outputs:
-                outputs[stack[-1]] = []
-              outputs[stack[-1]].append(l)
+    def __cache_get(self, key):
+      if (entry := self.__cache.get(key)) is not None:
+        self.__cache.move_to_end(key)
+        self.__cache_hits += 1
 
-          i += 1
+      else:
+        self.__cache_misses += 1
 
-        if len(stack) != 1:
-          raise Exception('unbalanced output tags')
+      return entry
 
-        if jinjafx_disable_dataloop:
-          break
+    def __cache_put(self, key, entry, size):
+      entry['size'] = size
+      self.__cache[key] = entry
+      self.__cache_used += size
+      return entry
 
-      for o in sorted(outputs.keys(), key=lambda x: int(x.split(':')[0])):
-        nkey = o.split(':', 1)[1]
-        if nkey not in outputs:
-          outputs[nkey] = []
+    def __cache_evict(self):
+      key, entry = self.__cache.popitem(last=False)
+      self.__cache_used -= entry['size']
 
-        outputs[nkey] += outputs[o]
-        if o in blanks:
-          outputs[nkey] += ' '
-        del outputs[o]
+      if 'loader' in entry and (env := self.__environments.get(key[1:3])) is not None:
+        self.__purge(env, entry['loader'])
 
-      outputs = {k: v for k, v in outputs.items() if (k == '_stderr_') or len(''.join(v).strip())}
-      return outputs
+    def __purge(self, env, loader):
+      if env.cache is not None:
+        for k in [k for k in env.cache.keys() if k[0]() in (loader, None)]:
+          del env.cache[k]
 
-    finally:
-      if tempdir is not None:
-        shutil.rmtree(tempdir)
+    def __environment_evict(self):
+      key = self.__environments.popitem(last=False)[0]
+
+      for k in [k for k in self.__cache if k[1:3] == key]:
+        self.__cache_used -= self.__cache.pop(k)['size']
 
 
   class TemplateError(jinja2.TemplateError):
@@ -1137,7 +2031,60 @@ class JinjaFx():
     return str(group[self.__g_dict[key] % len(group)])
 
 
+  def __jfx_data_row(self, fields, list_indices, int_indices, float_indices, jinjafx_filter):
+    for col in range(1, len(fields)):
+      if col in list_indices:
+        fields[col] = re.split(r'[ \t]*;[ \t]*', fields[col])
+
+        if col in int_indices:
+          fields[col] = list(map(int, fields[col]))
+
+        elif col in float_indices:
+          fields[col] = list(map(float, fields[col]))
+
+      elif col in int_indices:
+        fields[col] = int(fields[col])
+
+      elif col in float_indices:
+        fields[col] = float(fields[col])
+
+    for index in jinjafx_filter:
+      if isinstance(fields[index], list):
+        if not any(re.search(jinjafx_filter[index], v) for v in fields[index]):
+          return False
+
+      elif not re.search(jinjafx_filter[index], fields[index]):
+        return False
+
+    return True
+
+
   def __jfx_expand(self, s, rg=False):
+    if isinstance(s, str) and (program := _expansion(s)) is not None:
+      if self.__g_xlimit > 0 and program[0] >= self.__g_xlimit:
+        self.__g_xlimit = 0
+        raise OverflowError("jinjafx.expand() - expansion limit reached")
+
+      self.__g_xlimit -= program[0]
+      pofa = []
+      groups = []
+
+      for pieces, ordered, xgroups, targets, values in program[1]:
+        values = [tuple(str(n) for n in range(*v[:3]) for r in range(v[3] + 1)) if isinstance(v[0], int) else v for v in values]
+
+        for v in itertools.product(*values):
+          pofa.append(pieces[0] + ''.join(v[n] + p for n, p in zip(ordered, pieces[1:])))
+
+          if rg:
+            g = list(xgroups)
+            for (i, t), c in zip(targets, v):
+              if i >= 0:
+                g[i] = g[i].replace(t, c, 1)
+
+            groups.append(g)
+
+      return [pofa, groups] if rg else pofa
+
     pofa = [s]
     groups = [[s]]
 
@@ -1277,35 +2224,65 @@ class JinjaFx():
       return True if self.__g_row == (len(self.__g_datarows) - 1) else False
 
     try:
-      tv = ':'.join([str(self.__g_datarows[self.__g_row][i[0]]).split(i[1][0])[i[1][1]] for i in fpos])
+      tv = ':'.join([str(self.__g_datarows.column(i[0])[self.__g_row - 1]).split(i[1][0])[i[1][1]] for i in fpos])
 
     except IndexError:
       raise JinjaFx.TemplateError(f'invalid split operator for field "{f}" passed to jinjafx.{forl}()')
 
+    try:
+      key = (forl, tuple((i[0], i[1][0], i[1][1]) for i in fpos), tuple(ffilter.items()))
+      index = self.__g_fandl.get(key)
+
+    except TypeError:
+      key = index = None
+
+    if index is None:
+      index = self.__jfx_fandl_index(forl, fpos, ffilter)
+
+      if key is not None:
+        self.__g_fandl[key] = index
+
+    if tv in index[0]:
+      return True if self.__g_row == index[0][tv] else False
+
+    if index[1] is not None:
+      raise index[1]
+
+    return False
+
+
+  def __jfx_fandl_index(self, forl, fpos, ffilter):
+    index = {}
+
     if forl == 'first':
       rows = range(1, len(self.__g_datarows))
     else:
       rows = range(len(self.__g_datarows) - 1, 0, -1)
 
-    for r in rows:
-      fmatch = True
+    columns = [(self.__g_datarows.column(i[0]), i[1]) for i in fpos]
 
-      for f in ffilter:
-        if f in self.__g_datarows[0]:
-          try:
-            if not re.match(ffilter[f], str(self.__g_datarows[r][self.__g_datarows[0].index(f) + 1])):
-              fmatch = False
-              break
-          except Exception:
-            raise JinjaFx.TemplateError(f'invalid filter regex "{ffilter[f]}" for field "{f}" passed to jinjafx.{forl}()')
-        else:
-          raise JinjaFx.TemplateError(f'invalid filter field "{f}" passed to jinjafx.{forl}()')
+    try:
+      for r in rows:
+        fmatch = True
+
+        for f in ffilter:
+          if f in self.__g_datarows[0]:
+            try:
+              if not re.match(ffilter[f], str(self.__g_datarows.column(self.__g_datarows.index(f) + 1)[r - 1])):
+                fmatch = False
+                break
+            except Exception:
+              raise JinjaFx.TemplateError(f'invalid filter regex "{ffilter[f]}" for field "{f}" passed to jinjafx.{forl}()')
+          else:
+            raise JinjaFx.TemplateError(f'invalid filter field "{f}" passed to jinjafx.{forl}()')
+
+        if fmatch:
+          index.setdefault(':'.join([str(c[r - 1]).split(i[0])[i[1]] for c, i in columns]), r)
 
-      if fmatch:
-        if tv == ':'.join([str(self.__g_datarows[r][i[0]]).split(i[1][0])[i[1][1]] for i in fpos]):
-          return True if self.__g_row == r else False
+    except Exception as e:
+      return index, e
 
-    return False
+    return index, None
 
 
   def __jfx_exception(self, message):
@@ -1313,6 +2290,9 @@ class JinjaFx():
 
 
   def __jfx_warning(self, message, repeat=False):
+    if self.__g_wlog is not None:
+      self.__g_wlog.append((message, repeat))
+
     if repeat or message not in self.__g_warnings:
       self.__g_warnings.append(message)
     return ''
@@ -1335,17 +2315,34 @@ class JinjaFx():
     else:
       return None
 
+    try:
+      key = (field, tuple(ffilter.items()))
+      if key in self.__g_fields:
+        return list(self.__g_fields[key])
+
+    except TypeError:
+      key = None
+
     field_values = []
+    seen = set()
+    fregex = {}
 
-    for r in range(1, len(self.__g_datarows)):
+    for r, field_value in enumerate(self.__g_datarows.column(fpos), 1):
       fmatch = True
-      field_value = self.__g_datarows[r][fpos]
 
-      if field_value not in field_values and str(field_value).strip():
+      try:
+        unseen = field_value not in seen
+      except TypeError:
+        unseen = field_value not in field_values
+
+      if unseen and str(field_value).strip():
         for f in ffilter:
           if f in self.__g_datarows[0]:
             try:
-              if not re.match(ffilter[f], str(self.__g_datarows[r][self.__g_datarows[0].index(f) + 1])):
+              if f not in fregex:
+                fregex[f] = (re.compile(ffilter[f]), self.__g_datarows.column(self.__g_datarows.index(f) + 1))
+
+              if not fregex[f][0].match(str(fregex[f][1][r - 1])):
                 fmatch = False
                 break
             except Exception:
@@ -1356,7 +2353,15 @@ class JinjaFx():
         if fmatch:
           field_values.append(field_value)
 
-    return field_values
+          try:
+            seen.add(field_value)
+          except TypeError:
+            pass
+
+    if key is not None:
+      self.__g_fields[key] = field_values
+
+    return list(field_values)
 
 
   def __jfx_tabulate(self, datarows=None, *, cols=None, style='default'):
@@ -1372,7 +2377,7 @@ class JinjaFx():
       raise JinjaFx.TemplateError(f'invalid style "{style}" passed to jinjafx.tabulate()')
 
     if datarows is None:
-      datarows = self.__g_datarows
+      datarows = list(self.__g_datarows)
       offset = 1
 
     if len(datarows) > 1:
@@ -1458,6 +2463,9 @@ class JinjaFx():
     if row is None:
       row = self.__g_row
 
+    else:
+      self.__g_stateful = True
+
     if key is None:
       key = '_cnt_r_' + str(row)
 
@@ -1482,6 +2490,7 @@ class JinjaFx():
 
     else:
       key = '_cnt_k_' + str(key).lower()
+      self.__g_stateful = True
 
     n = self.__g_dict.get(key, int(start) - int(increment))
     self.__g_dict[key] = int(n) + int(increment)
@@ -1489,11 +2498,13 @@ class JinjaFx():
 
 
   def __jfx_setg(self, key, value):
+    self.__g_stateful = True
     self.__g_dict['_val_' + str(key)] = value
     return ''
 
 
   def __jfx_getg(self, key, default=None):
+    self.__g_stateful = True
     return self.__g_dict.get('_val_' + str(key), default)
 
 
@@ -1506,11 +2517,35 @@ class JinjaFx():
 
 
 class AnsibleVault():
+  cache_size = 1024
+  __kcache = collections.OrderedDict()
+  __klock = threading.Lock()
+
+  @classmethod
+  def clear_cache(cls):
+    with cls.__klock:
+      cls.__kcache.clear()
+
   def __derive_key(self, b_password, b_salt=None):
     if b_salt is None:
       b_salt = os.urandom(32)
+      return [b_salt, PBKDF2HMAC(hashes.SHA256(), 80, b_salt, 10000).derive(b_password)]
+
+    ckey = (hashlib.sha256(b_password).digest(), b_salt)
+
+    with self.__klock:
+      if (b_key := self.__kcache.get(ckey)) is not None:
+        self.__kcache.move_to_end(ckey)
+        return [b_salt, b_key]
 
     b_key = PBKDF2HMAC(hashes.SHA256(), 80, b_salt, 10000).derive(b_password)
+
+    with self.__klock:
+      self.__kcache[ckey] = b_key
+
+      while len(self.__kcache) > max(0, self.cache_size):
+        self.__kcache.popitem(last=False)
+
     return [b_salt, b_key]
 
   def encrypt(self, b_string, password):
@@ -1570,24 +2605,171 @@ class AnsibleVault():
     else:
       raise Exception('data isn\'t ansible vault encrypted')
 
+  def encrypt_stream(self, fin, fout, password, chunk_size=1024 * 1024):
+    start = fin.tell()
+    b_head = b''
+
+    while len(b_head) < 15 and (b_chunk := fin.read(chunk_size)):
+      b_head = (b_head + b_chunk).lstrip()
+
+    if b_head.startswith(b'$ANSIBLE_VAULT;'):
+      raise Exception('data is already encrypted with ansible vault')
+
+    b_salt, b_derivedkey = self.__derive_key(password.encode('utf-8'))
+
+    fin.seek(start)
+    hmac = HMAC(b_derivedkey[32:64], hashes.SHA256())
+
+    for b_ciphertext in self.__encrypt_chunks(fin, b_derivedkey, chunk_size):
+      hmac.update(b_ciphertext)
+
+    fin.seek(start)
+    fout.write(b'$ANSIBLE_VAULT;1.1;AES256\n')
+    b_pending = b''
+
+    for b_chunk in itertools.chain([(b_salt.hex() + '\n' + hmac.finalize().hex() + '\n').encode('utf-8')], (c.hex().encode('utf-8') for c in self.__encrypt_chunks(fin, b_derivedkey, chunk_size))):
+      b_pending += b_chunk.hex().encode('utf-8')
+      n = len(b_pending) - len(b_pending) % 80
+
+      if n:
+        fout.write(b'\n'.join([b_pending[i:i + 80] for i in range(0, n, 80)]) + b'\n')
+        b_pending = b_pending[n:]
+
+    if b_pending:
+      fout.write(b_pending + b'\n')
+
+  def decrypt_stream(self, fin, fout, password, chunk_size=1024 * 1024):
+    while (b_line := fin.readline()) and not b_line.strip():
+      pass
+
+    hdr = list(map(bytes.strip, b_line.strip().split(b';')))
+    start = fin.tell()
+
+    if hdr[0] == b'$ANSIBLE_VAULT' and fin.read(chunk_size).strip():
+      if hdr[1] == b'1.1' or hdr[1] == b'1.2':
+        if hdr[2] == b'AES256':
+          fin.seek(start)
+          b_salt, b_hmac, b_ciphertext = self.__read_vault(fin, chunk_size)
+          b_derivedkey = self.__derive_key(password.encode('utf-8'), b_salt)[1]
+
+          hmac = HMAC(b_derivedkey[32:64], hashes.SHA256())
+
+          for b_chunk in b_ciphertext:
+            hmac.update(b_chunk)
+
+          try:
+            hmac.verify(b_hmac)
+
+          except InvalidSignature:
+            raise Exception('invalid ansible vault password')
+
+          fin.seek(start)
+          u = PKCS7(128).unpadder()
+          d = Cipher(AES(b_derivedkey[:32]), CTR(b_derivedkey[64:80])).decryptor()
+
+          for b_chunk in self.__read_vault(fin, chunk_size)[2]:
+            fout.write(u.update(d.update(b_chunk)))
+
+          fout.write(u.update(d.finalize()) + u.finalize())
+
+        else:
+          raise Exception('unknown ansible vault cipher')
+
+      else:
+        raise Exception('unknown ansible vault version')
+
+    else:
+      raise Exception('data isn\'t ansible vault encrypted')
+
+  def __encrypt_chunks(self, fin, b_derivedkey, chunk_size):
+    p = PKCS7(128).padder()
+    e = Cipher(AES(b_derivedkey[:32]), CTR(b_derivedkey[64:80])).encryptor()
+
+    while b_chunk := fin.read(chunk_size):
+      yield e.update(p.update(b_chunk))
+
+    yield e.update(p.finalize()) + e.finalize()
+
+  def __read_vault(self, fin, chunk_size):
+    vaulttext = self.__unhex(iter(functools.partial(fin.read, chunk_size), b''))
+    b_head = b''
+
+    for b_chunk in vaulttext:
+      b_head += b_chunk
+
+      if b_head.count(b'\n') >= 2:
+        break
+
+    b_salt, b_hmac, b_ciphertext = b_head.split(b'\n', 2)
+    return bytes.fromhex(b_salt.decode('utf-8')), bytes.fromhex(b_hmac.decode('utf-8')), self.__unhex(itertools.chain([b_ciphertext], vaulttext))
+
+  def __unhex(self, chunks):
+    b_carry = b''
+
+    for b_chunk in chunks:
+      b_chunk = b_carry + b''.join(b_chunk.split())
+      n = len(b_chunk) - len(b_chunk) % 2
+      b_carry = b_chunk[n:]
+      yield bytes.fromhex(b_chunk[:n].decode('utf-8'))
+
+    if b_carry:
+      bytes.fromhex(b_carry.decode('utf-8'))
+
 
 class Vaulty():
-  def __init__(self):
+  def __init__(self, cache_size=256, cache_age=3600):
     self.__prefix = '$VAULTY;'
-    self.__kcache = {}
+    self.__kcache = collections.OrderedDict()
+    self.__kcache_size = cache_size
+    self.__kcache_age = cache_age
+    self.__klock = threading.Lock()
+    self.__cache_hits = 0
+    self.__cache_misses = 0
+    self.__derive_time = 0.0
+
+  @property
+  def cache_hits(self):
+    return self.__cache_hits
+
+  @property
+  def cache_misses(self):
+    return self.__cache_misses
+
+  @property
+  def derive_time(self):
+    return self.__derive_time
 
   def __derive_key(self, password, salt=None):
-    if (ckey := (password, salt)) in self.__kcache:
-      e = self.__kcache[ckey]
-      self.__kcache[ckey] = e[0], e[1], e[2] + 1
-      return self.__kcache[ckey]
+    ckey = (hashlib.sha256(password.encode('utf-8')).digest(), salt)
+    now = time.monotonic()
+
+    with self.__klock:
+      if (e := self.__kcache.get(ckey)) is not None:
+        if now - e[3] < self.__kcache_age and e[2] < 0xffffffff:
+          self.__kcache[ckey] = e = (e[0], e[1], e[2] + 1, e[3])
+          self.__kcache.move_to_end(ckey)
+          self.__cache_hits += 1
+          return e[:3]
+
+        del self.__kcache[ckey]
+
+      self.__cache_misses += 1
 
     if salt is None:
       salt = os.urandom(16)
 
+    start = time.perf_counter()
     key = Scrypt(salt, 32, 2**16, 8, 1).derive(password.encode('utf-8'))
-    self.__kcache[ckey] = [salt, key, 0]
-    return [salt, key, 0]
+
+    with self.__klock:
+      self.__derive_time += time.perf_counter() - start
+      self.__kcache[ckey] = (salt, key, 0, now)
+      self.__kcache.move_to_end(ckey)
+
+      while len(self.__kcache) > max(0, self.__kcache_size):
+        self.__kcache.popitem(last=False)
+
+    return salt, key, 0
 
   def encrypt(self, plaintext, password, cols=None):
     version = b'\x01'
@@ -1603,21 +2785,82 @@ class Vaulty():
     return r
 
   def decrypt(self, ciphertext, password):
+    return self.__decrypt(self.__unpack(ciphertext), password)
+
+  def encrypt_batch(self, plaintexts, password, cols=None):
+    if isinstance(plaintexts, str):
+      return self.encrypt(plaintexts, password, cols)
+
+    if isinstance(plaintexts, dict):
+      return { k: self.encrypt(v, password, cols) for k, v in plaintexts.items() }
+
+    return [self.encrypt(v, password, cols) for v in plaintexts]
+
+  def decrypt_batch(self, ciphertexts, password):
+    if isinstance(ciphertexts, str):
+      return self.decrypt(ciphertexts, password)
+
+    items = list(ciphertexts.items()) if isinstance(ciphertexts, dict) else list(enumerate(ciphertexts))
+    nciphertexts = []
+
+    for k, v in items:
+      try:
+        nciphertexts.append(self.__unpack(v))
+
+      except Exception as e:
+        nciphertexts.append(e)
+
+    salts = { n[1:17] for n in nciphertexts if isinstance(n, bytes) }
+    keys = {}
+
+    if len(salts) > 1:
+      with concurrent.futures.ThreadPoolExecutor(min(len(salts), os.cpu_count() or 1)) as executor:
+        keys = { salt: executor.submit(self.__derive_key, password, salt) for salt in salts }
+
+    plaintexts = []
+
+    for n in nciphertexts:
+      if isinstance(n, Exception):
+        raise n
+
+      plaintexts.append(self.__decrypt(n, password, keys))
+
+    if isinstance(ciphertexts, dict):
+      return { k: v for (k, c), v in zip(items, plaintexts) }
+
+    return plaintexts
+
+  def __unpack(self, ciphertext):
     if ciphertext.lstrip().startswith(self.__prefix):
       try:
         nciphertext = base64.b64decode(ciphertext.strip()[len(self.__prefix):])
 
         if len(nciphertext) > 29 and nciphertext.startswith(b'\x01'):
-          key = self.__derive_key(password, nciphertext[1:17])[1]
-          return ChaCha20Poly1305(key).decrypt(nciphertext[17:29], nciphertext[29:], None).decode('utf-8')
+          return nciphertext
 
       except Exception:
         pass
 
-      raise JinjaFx.TemplateError('invalid vaulty password or ciphertext malformed')
+      return None
 
     raise JinjaFx.TemplateError('data not encrypted with vaulty')
 
+  def __decrypt(self, nciphertext, password, keys={}):
+    try:
+      if nciphertext is not None:
+        if (key := keys.get(nciphertext[1:17])) is not None:
+          key = key.result()[1]
+
+        else:
+          key = self.__derive_key(password, nciphertext[1:17])[1]
+
+        return ChaCha20Poly1305(key).decrypt(nciphertext[17:29], nciphertext[29:], None).decode('utf-8')
+
+    except Exception:
+      pass
+
+    raise JinjaFx.TemplateError('invalid vaulty password or ciphertext malformed')
+
 
 if __name__ == '__main__':
   main()